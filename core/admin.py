@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from django.contrib import messages
-from .models import Tenant, CustomUser, CapitalAccount, Contact, Product, StockItem, RentalContract, Transaction, SerialNumberFactory
+from .models import Tenant, CustomUser, CapitalAccount, Contact, Product, StockItem, RentalContract, Transaction, SerialNumberFactory, DailyRollup, TenantSequence
 
 @admin.register(Tenant)
 class TenantAdmin(admin.ModelAdmin):
@@ -61,4 +61,12 @@ class TransactionAdmin(admin.ModelAdmin): pass
 @admin.register(RentalContract)
 class RentalContractAdmin(admin.ModelAdmin): pass
 @admin.register(SerialNumberFactory)
-class SerialNumberFactoryAdmin(admin.ModelAdmin): pass
\ No newline at end of file
+class SerialNumberFactoryAdmin(admin.ModelAdmin): pass
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'tenant', 'type', 'staff_id', 'category', 'amount', 'count')
+    list_filter = ('tenant', 'type')
+@admin.register(TenantSequence)
+class TenantSequenceAdmin(admin.ModelAdmin):
+    list_display = ('tenant', 'name', 'value')
+    list_filter = ('tenant',)
@@ -0,0 +1,313 @@
+from datetime import datetime, time, timedelta
+from itertools import accumulate, chain
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django.db.models import Sum, Count, Q, F, DecimalField, BigIntegerField, Case, When, Window
+from django.db.models.functions import Cast, Round, ExtractYear, ExtractMonth
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from core.models import DailyRollup, Product, CustomUser, Transaction
+
+# ==========================================
+# 🕒 1. 时间区间工具
+# ==========================================
+def day_start(day):
+    """本地日期 -> 当天 00:00 (带时区)，用于半开区间过滤，不对字段做 __date 转换 (可走索引)"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def day_range(start_day, end_day):
+    """[start_day 00:00, end_day+1 00:00) 半开区间"""
+    return day_start(start_day), day_start(end_day + timedelta(days=1))
+
+# ==========================================
+# 🗄️ 2. 租户级缓存
+# ==========================================
+DASHBOARD_TTL = 300  # 兜底过期 (秒)，正常由数据变更主动失效
+
+def dashboard_cache_key(tenant_id, day=None):
+    day = day or timezone.localdate()
+    return f"zen:dashboard:{tenant_id or 'all'}:{day:%Y%m%d}"
+
+def clear_dashboard_cache(tenant_id):
+    """立即清掉该租户 (及平台超管汇总) 的看板缓存"""
+    cache.delete_many([dashboard_cache_key(tenant_id), dashboard_cache_key(None)])
+
+def invalidate_tenant_cache(tenant_id):
+    """租户业务数据变更：事务提交后清看板缓存"""
+    transaction.on_commit(lambda: clear_dashboard_cache(tenant_id))
+
+def cached_for_tenant(key, builder, ttl=DASHBOARD_TTL):
+    data = cache.get(key)
+    if data is None:
+        data = builder(); cache.set(key, data, ttl)
+    return data
+
+async def acached_for_tenant(key, abuilder, ttl=DASHBOARD_TTL):
+    """异步版：abuilder 为协程函数"""
+    data = await cache.aget(key)
+    if data is None:
+        data = await abuilder(); await cache.aset(key, data, ttl)
+    return data
+
+# ==========================================
+# 📈 3. 经营日汇总 (DailyRollup) 增量维护
+# ==========================================
+def rollup_key(tx, category=None):
+    """流水 -> 汇总行主键 (本地日期、经手人、商品分类)"""
+    if category is None:
+        category = Product.objects.filter(id=tx.product_id).values_list('category', flat=True).first() if tx.product_id else ''
+    return {'tenant_id': tx.tenant_id, 'day': timezone.localdate(tx.created_at), 'type': tx.type, 'staff_id': tx.operator_id or 0, 'category': category or ''}
+
+def rollup_cost(tx):
+    """销售成本取流水上记下的成交成本 (不跟随商品参考成本变动)"""
+    return (tx.cost or Decimal('0')) if tx.type == 'SALE' else Decimal('0')
+
+def bump_rollup(key, amount, cost, count):
+    """F() 原子累加；行不存在则插入 (并发插入撞唯一键时退回累加)"""
+    delta = {'amount': F('amount') + amount, 'cost': F('cost') + cost, 'count': F('count') + count}
+    if DailyRollup.objects.filter(**key).update(**delta): return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(**key, amount=amount, cost=cost, count=count)
+    except IntegrityError:
+        DailyRollup.objects.filter(**key).update(**delta)
+
+def apply_to_rollup(tx, sign=1, key=None, cost=None):
+    """把一笔流水计入 (sign=1) 或移出 (sign=-1) 日汇总。
+    主键/成本在事务内算好，累加推迟到提交后：同一天同一分类的汇总行是热点，不能在整笔销售事务里一直持有行锁。
+    提交后进程崩溃会漏记一笔，rollup_sales --verify 可查出并回填。
+    看板读的是汇总，所以累加之后再清一次看板缓存：信号里的清缓存先于累加执行，中间进来的请求会把旧汇总缓存下来"""
+    if not tx.tenant_id or not tx.created_at: return
+    key = key or rollup_key(tx)
+    cost = rollup_cost(tx) if cost is None else cost
+    amount = tx.amount; tenant_id = tx.tenant_id
+    def bump():
+        bump_rollup(key, sign * amount, sign * cost, sign)
+        clear_dashboard_cache(tenant_id)
+    transaction.on_commit(bump)
+
+def rollup_rows_from_ledger(txs):
+    """从原始流水重新聚合出汇总行 (回填/校验用)，txs 为 Transaction queryset"""
+    rows = (txs.annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+            .values('tenant_id', 'day', 'type', 'operator_id', 'product__category')
+            .annotate(amount=Sum('amount'), cost=Sum('cost', filter=Q(type='SALE')), count=Count('id'))
+            .order_by())
+    return [DailyRollup(tenant_id=r['tenant_id'], day=r['day'], type=r['type'], staff_id=r['operator_id'] or 0, category=r['product__category'] or '',
+                        amount=r['amount'] or 0, cost=r['cost'] or 0, count=r['count']) for r in rows]
+
+def rollup_trend(rollups, first_day, last_day, types=None):
+    """按天汇总：{day: {'amount', 'sale_count'}}"""
+    qs = rollups.filter(day__gte=first_day, day__lte=last_day)
+    if types: qs = qs.filter(type__in=types)
+    return {r['day']: r for r in qs.values('day').annotate(amount=Sum('amount'), sale_count=Sum('count', filter=Q(type='SALE'))).order_by()}
+
+def rollup_monthly(rollups, months=12):
+    """近 N 个月按月 x 类型汇总 (环比图)"""
+    today = timezone.localdate()
+    first = today.replace(day=1)
+    for _ in range(months - 1): first = (first - timedelta(days=1)).replace(day=1)
+    labels = []; m = first
+    while m <= today:
+        labels.append(m); m = (m + timedelta(days=32)).replace(day=1)
+    data = {}
+    for r in rollups.filter(day__gte=first).annotate(month=TruncMonth('day')).values('month', 'type').annotate(amount=Sum('amount'), cost=Sum('cost'), count=Sum('count')).order_by():
+        data.setdefault(r['type'], {})[r['month']] = r
+    series = {t: [float(data.get(t, {}).get(m, {}).get('amount') or 0) for m in labels] for t, _ in DailyRollup._meta.get_field('type').choices}
+    sales_cost = [float(data.get('SALE', {}).get(m, {}).get('cost') or 0) for m in labels]
+    profit = [round(s - c, 2) for s, c in zip(series['SALE'], sales_cost)]
+    return {'labels': [m.strftime('%Y-%m') for m in labels], 'series': series, 'profit': profit}
+
+# ==========================================
+# 📊 4. 首页看板 (少量分组聚合，代替逐日/逐行查询)
+# ==========================================
+INCOME_TYPES = ('SALE', 'RENT')
+TREND_DAYS = 7
+
+def dashboard_queries(txs, items, contacts, accounts, rollups):
+    """参数为已按租户过滤的 queryset；返回 {名称: 无参函数}，共 6 条 SQL，彼此独立可并发执行，趋势与分类只读日汇总小表"""
+    today = timezone.localdate()
+    first_day = today - timedelta(days=TREND_DAYS - 1)
+    today_from = day_start(today)
+    return {
+        # 1) 近 7 天收入趋势 + 今日销售笔数 (日汇总)
+        'trend': lambda: rollup_trend(rollups, first_day, today, INCOME_TYPES),
+        # 1b) 近 7 天各分类销售额 (日汇总)
+        'by_cat': lambda: list(rollups.filter(type='SALE', day__gte=first_day, day__lte=today).values('category').annotate(amount=Sum('amount')).order_by('-amount')),
+        # 2) 库存货值 (只算 IN_STOCK，不含 PENDING) + 今日入库台数
+        'stock': lambda: items.aggregate(val=Sum('real_cost', filter=Q(status='IN_STOCK')), entry=Count('id', filter=Q(in_time__gte=today_from))),
+        # 3) 应收 / 应付
+        'debts': lambda: contacts.aggregate(receivable=Sum('balance', filter=Q(balance__gt=0)), payable=Sum('balance', filter=Q(balance__lt=0))),
+        # 4) 资金
+        'cash': lambda: accounts.aggregate(s=Sum('current_balance'))['s'] or 0,
+        # 5) 最近流水
+        'recent': lambda: [{
+            'id': t.id,
+            'desc': f"{t.get_type_display()} - {t.product.name if t.product else (t.remark or '-')}",
+            'amount': t.amount,
+            'is_income': t.type in ['SALE', 'RENT', 'OTHER'],
+            'time': t.created_at.strftime('%m-%d %H:%M')
+        } for t in txs.select_related('product').order_by('-created_at')[:10]],
+    }
+
+def assemble_dashboard(r):
+    """把 dashboard_queries 各项结果拼成看板 JSON"""
+    today = timezone.localdate()
+    days = [today - timedelta(days=TREND_DAYS - 1 - i) for i in range(TREND_DAYS)]
+    per_day = r['trend']; today_row = per_day.get(today, {})
+    cat_names = dict(Product.TYPE_CHOICES); by_cat = r['by_cat']
+    category_chart = {'labels': [cat_names.get(c['category'], '其他') for c in by_cat], 'data': [float(c['amount'] or 0) for c in by_cat]} if by_cat else {'labels': ['默认'], 'data': [1]}
+    stock, debts = r['stock'], r['debts']
+    return {
+        'cards': {'stock_val': stock['val'] or 0, 'total_sales_amount': today_row.get('amount') or 0, 'receivable': debts['receivable'] or 0, 'payable': abs(debts['payable'] or 0), 'cash': r['cash']},
+        'today_entry': stock['entry'], 'today_sale': today_row.get('sale_count') or 0,
+        'charts': {'trend': {'labels': [d.strftime('%m-%d') for d in days], 'data': [float(per_day.get(d, {}).get('amount') or 0) for d in days]}, 'category': category_chart},
+        'recent_list': r['recent']
+    }
+
+def build_dashboard(txs, items, contacts, accounts, rollups):
+    """同步版：6 条 SQL 依次执行 (接口走 core.views.analysis_dashboard 并发执行)"""
+    return assemble_dashboard({k: fn() for k, fn in dashboard_queries(txs, items, contacts, accounts, rollups).items()})
+
+# 🟢 资产总览 (资金 + 库存 + 往来)，3 条 SQL 互相独立
+def accounting_queries(accounts, items, contacts):
+    return {
+        'accounts': lambda: list(accounts.values('id', 'name', 'current_balance')),
+        'stock': lambda: items.filter(status='IN_STOCK').aggregate(s=Sum('real_cost'))['s'] or 0,
+        'debts': lambda: contacts.aggregate(receivable=Sum('balance', filter=Q(balance__gt=0)), payable=Sum('balance', filter=Q(balance__lt=0))),
+    }
+
+def assemble_accounting(r):
+    accounts = [{'id': a['id'], 'name': a['name'], 'balance': a['current_balance']} for a in r['accounts']]
+    total_cash = sum([a['balance'] for a in accounts]) or 0
+    receivable = r['debts']['receivable'] or 0; payable = r['debts']['payable'] or 0
+    net_worth = total_cash + r['stock'] + receivable + payable
+    return {'cash': total_cash, 'stock': r['stock'], 'receivable': receivable, 'payable': abs(payable), 'net_worth': net_worth, 'accounts': accounts}
+
+# ==========================================
+# 💹 5. 利润报表 (数据库聚合，明细按需分页/流式)
+# ==========================================
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+PROFIT_COLUMNS = ('id', 'created_at', 'amount', 'product__name', 'product__zencode', 'operator__first_name', 'contact__name')
+
+def profit_rows(txs):
+    """销售明细：只取展示列，毛利在 SQL 里算 (values 字典，不实例化模型)"""
+    return txs.annotate(profit=F('amount') - F('cost')).values(*PROFIT_COLUMNS, 'profit')
+
+def profit_row(r):
+    return {
+        'date': r['created_at'].strftime('%Y-%m-%d'),
+        'product_name': r['product__name'] or '未知商品',
+        'zencode': r['product__zencode'] or '-',
+        'staff': r['operator__first_name'] if r['operator__first_name'] is not None else '系统',
+        'customer': r['contact__name'] or '散客',
+        'profit': r['profit'],
+        'sales': r['amount']
+    }
+
+def profit_by_staff(rollups):
+    """员工业绩：日汇总按经手人分组"""
+    rows = list(rollups.values('staff_id').annotate(sales=Sum('amount'), cost=Sum('cost'), count=Sum('count')).order_by('-sales'))
+    names = {u['id']: u['first_name'] or u['username'] for u in CustomUser.objects.filter(id__in=[r['staff_id'] for r in rows]).values('id', 'first_name', 'username')}
+    return [{'id': r['staff_id'], 'name': names.get(r['staff_id'], '系统'), 'sales': r['sales'], 'profit': r['sales'] - r['cost'], 'count': r['count']} for r in rows]
+
+def profit_by_customer(txs, top=20):
+    """客户贡献：流水按客户分组，取前 top 名"""
+    rows = txs.values('contact_id', 'contact__name').annotate(sales=Sum('amount'), cost=Sum('cost'), count=Count('id')).order_by('-sales')[:top]
+    return [{'id': r['contact_id'], 'name': r['contact__name'] or '散客', 'sales': r['sales'], 'profit': r['sales'] - r['cost'], 'count': r['count']} for r in rows]
+
+# ==========================================
+# 🏦 6. 资金账户对账单 (窗口函数累计余额)
+# ==========================================
+TYPE_NAMES = dict(Transaction.TYPE_CHOICES)
+STATEMENT_COLUMNS = ('id', 'created_at', 'type', 'amount', 'remark', 'contact__name', 'product__name', 'operator__first_name')
+
+def signed_amount():
+    """采购为支出记负，其余 (销售/租金/其他) 为收入记正"""
+    return Case(When(type='BUY', then=-F('amount')), default=F('amount'), output_field=MONEY)
+
+def opening_balance(account, txs, start=None):
+    """区间期初 = 账户期初余额 + 区间开始前的全部收支"""
+    if not start: return account.initial_balance
+    before = txs.filter(created_at__lt=day_start(start)).aggregate(s=Sum(signed_amount()))['s'] or 0
+    return account.initial_balance + before
+
+def statement_rows(txs):
+    """running = 按 id 正序累加 WHERE 范围内的收支。
+    再加 id__lt 游标过滤时，窗口只覆盖游标之前的行，页内每行仍是从区间起点累计的余额"""
+    return txs.annotate(signed=signed_amount(), running=Window(Sum(signed_amount()), order_by=F('id').asc())).values(*STATEMENT_COLUMNS, 'signed', 'running')
+
+def statement_row(r, opening):
+    is_income = r['type'] != 'BUY'
+    return {
+        'id': r['id'], 'date': r['created_at'].strftime('%Y-%m-%d %H:%M'), 'type_name': TYPE_NAMES.get(r['type'], r['type']),
+        'amount': r['amount'], 'sign': '+' if is_income else '-', 'is_income': is_income,
+        'target': r['contact__name'] or r['product__name'] or '-', 'remark': r['remark'] or '-',
+        'operator': r['operator__first_name'] if r['operator__first_name'] is not None else '系统',
+        'balance': opening + r['running']
+    }
+
+# ==========================================
+# 🔮 7. 租赁现金流 / 利润预测 (按列取数 + 数组运算)
+# ==========================================
+FORECAST_MAX_MONTHS = 36
+FORECAST_TTL = 24 * 3600  # 兜底过期，正常由合同变更主动失效 (键含日期，跨天自动重算)
+
+def forecast_cache_key(tenant_id, day=None):
+    day = day or timezone.localdate()
+    return f"zen:forecast:{tenant_id or 'all'}:{day:%Y%m%d}"
+
+def invalidate_forecast(tenant_id):
+    keys = [forecast_cache_key(tenant_id), forecast_cache_key(None)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+def _cents(field): return Cast(Round(F(field) * 100), BigIntegerField())
+
+def forecast_columns(contracts):
+    """进行中合同 -> 整数列 (起租月序号, 租期, 月租, 月折旧, 押金)，金额单位为分；月序号 = 年*12 + 月-1，都在数据库里算好"""
+    return contracts.filter(is_active=True).annotate(
+        m0=ExtractYear('start_date') * 12 + ExtractMonth('start_date') - 1,
+        rent_c=_cents('rent_price'), dep_c=_cents('depreciation_monthly'), deposit_c=_cents('deposit_amount'),
+    ).values_list('m0', 'duration', 'rent_c', 'dep_c', 'deposit_c')
+
+def project_months(rows, first, months):
+    """逐月 (租金, 折旧, 退押金)，单位分。第 k 期租金/折旧落在 起租月+k (租期内每月一次)；押金在到期月退还，已逾期未还的计入首月。
+    有 numpy 时整体做数组运算 (在租矩阵 x 金额列)，否则退回差分数组累加"""
+    try: import numpy as np
+    except ImportError: return _project_months_py(rows, first, months)
+    start, dur, rent, dep, deposit = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=5 * len(rows)).reshape(-1, 5).T
+    end = start + dur; m = first + np.arange(months)
+    live = (start[:, None] <= m) & (m < end[:, None])  # (合同数, 月数)
+    out = np.maximum(end, first) - first; hit = out < months
+    refund = np.zeros(months, dtype=np.int64); np.add.at(refund, out[hit], deposit[hit])
+    return (rent @ live).tolist(), (dep @ live).tolist(), refund.tolist()
+
+def _project_months_py(rows, first, months):
+    rent = [0] * (months + 1); dep = [0] * (months + 1); refund = [0] * months
+    for start, dur, r, d, deposit in rows:
+        lo, hi = max(start, first) - first, min(start + dur, first + months) - first
+        if lo < hi: rent[lo] += r; rent[hi] -= r; dep[lo] += d; dep[hi] -= d
+        k = max(start + dur, first) - first
+        if k < months: refund[k] += deposit
+    return list(accumulate(rent))[:months], list(accumulate(dep))[:months], refund
+
+def build_rental_forecast(contracts):
+    """缓存的原始结果：从本月起 FORECAST_MAX_MONTHS 个月的分值序列，接口按需截取"""
+    today = timezone.localdate(); first = today.year * 12 + today.month - 1
+    rows = list(forecast_columns(contracts))
+    rent, dep, refund = project_months(rows, first, FORECAST_MAX_MONTHS)
+    return {'first': first, 'contracts': len(rows), 'rent': rent, 'depreciation': dep, 'deposit_return': refund}
+
+def assemble_forecast(raw, months):
+    """前 months 个月：租金 / 折旧 / 预计毛利 (租金-折旧) / 退押金 / 净现金流 (租金-退押金)，金额转回元"""
+    cols = {k: raw[k][:months] for k in ('rent', 'depreciation', 'deposit_return')}
+    cols['profit'] = [r - d for r, d in zip(cols['rent'], cols['depreciation'])]
+    cols['net_cash'] = [r - d for r, d in zip(cols['rent'], cols['deposit_return'])]
+    yuan = lambda c: Decimal(c).scaleb(-2)
+    return {
+        'labels': [f"{(raw['first'] + j) // 12}-{(raw['first'] + j) % 12 + 1:02d}" for j in range(months)],
+        'contracts': raw['contracts'],
+        **{k: [yuan(c) for c in v] for k, v in cols.items()},
+        'totals': {k: yuan(sum(v)) for k, v in cols.items()},
+    }
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from core import signals  # noqa: F401  注册缓存失效信号
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.crypto import salted_hmac
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.tenancy import bind_tenant
+
+# ==========================================
+# 🔑 认证加速 (用户缓存 + 签名令牌)
+# ==========================================
+TOKEN_KEYWORD = b'zen'
+TOKEN_SALT = 'zen.api-token'
+
+def user_cache_key(user_id): return f"zen:user:{user_id}"
+
+def get_cached_user(user_id):
+    """按 id 取用户：先读缓存，未命中再查库回填 (不带租户，租户由 core.tenancy 另行缓存)；ZEN_USER_CACHE_TTL=0 时直接查库"""
+    if not settings.ZEN_USER_CACHE_TTL: return get_user_model()._default_manager.filter(pk=user_id).first()
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if user: cache.set(key, user, settings.ZEN_USER_CACHE_TTL)
+    return user
+
+def invalidate_user(user_id):
+    transaction.on_commit(lambda: cache.delete(user_cache_key(user_id)))
+
+class CachedModelBackend(ModelBackend):
+    """登录校验同 ModelBackend；会话恢复用户 (每个请求一次) 走缓存"""
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user and self.user_can_authenticate(user) else None
+
+# 令牌 = 签名(用户id + 密码指纹)：改密码即全部失效，服务端不存任何状态
+def _password_fingerprint(user): return salted_hmac(TOKEN_SALT, user.password).hexdigest()[:16]
+
+def issue_token(user):
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign_object({'u': user.pk, 'p': _password_fingerprint(user)})
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authorization: Zen <token>；不读会话表，用户/租户都走缓存，租户停用或到期同样拒绝"""
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != TOKEN_KEYWORD: return None
+        if len(auth) != 2: raise AuthenticationFailed('令牌格式错误')
+        try: data = signing.TimestampSigner(salt=TOKEN_SALT).unsign_object(auth[1].decode(), max_age=settings.ZEN_TOKEN_TTL)
+        except signing.SignatureExpired: raise AuthenticationFailed('令牌已过期，请重新登录')
+        except (signing.BadSignature, UnicodeDecodeError): raise AuthenticationFailed('令牌无效')
+        user = get_cached_user(data.get('u'))
+        if not user or not user.is_active or data.get('p') != _password_fingerprint(user): raise AuthenticationFailed('令牌已失效，请重新登录')
+        if user.tenant_id:
+            reason = bind_tenant(request._request, user)
+            if reason: raise AuthenticationFailed(reason)
+        return user, None
+
+    def authenticate_header(self, request): return 'Zen'
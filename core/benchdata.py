@@ -0,0 +1,115 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+
+from core.analytics import rollup_rows_from_ledger
+from core.models import Tenant, CustomUser, Product, StockItem, Contact, CapitalAccount, RentalContract, Transaction, DailyRollup, rental_schedule
+
+# ==========================================
+# 🧪 压测数据 (合成租户) 与接口清单，供 bench_api / 压测命令共用
+# ==========================================
+SEED_BATCH = 5000
+SCALES = {  # 预设规模：商品 / 每商品台数 / 客户 / 流水 / 租赁合同 / 流水分布天数
+    'small':  dict(products=50,   units=10, contacts=100,   transactions=2000,   rentals=50,   days=90),
+    'medium': dict(products=500,  units=20, contacts=2000,  transactions=50000,  rentals=1000, days=365),
+    'large':  dict(products=2000, units=50, contacts=10000, transactions=500000, rentals=5000, days=730),
+}
+BENCH_PASSWORD = 'bench'
+
+def _money(rng, lo, hi): return Decimal(rng.randint(lo * 100, hi * 100)) / 100
+
+def seed_tenant(products, units, contacts, transactions, rentals, days, seed=0, log=None):
+    """批量 INSERT 造一个完整租户 (不触发信号，最后按流水回填日汇总)，返回 (tenant, admin)。
+    同一 seed 生成的数据分布一致，便于前后对比"""
+    rng = random.Random(seed); tag = time.time_ns() % 10**12; now = timezone.now()
+    step = lambda msg: log and log(msg)
+    with transaction.atomic():
+        tenant = Tenant.objects.create(name=f'压测{tag}', owner_name='bench', phone=f'seed{tag}', account_limit=10)
+        admin = CustomUser.objects.create_user(username=f'bench{tag}', password=BENCH_PASSWORD, tenant=tenant, role='ADMIN', initials='BM')
+        staff = [admin] + [CustomUser.objects.create_user(username=f'bench{tag}s{i}', password=BENCH_PASSWORD, tenant=tenant, role='SALES') for i in range(3)]
+        accounts = CapitalAccount.objects.bulk_create([CapitalAccount(tenant=tenant, name=n, initial_balance=0, current_balance=_money(rng, 1000, 100000)) for n in ('现金', '微信', '银行卡')])
+
+        people = Contact.objects.bulk_create([
+            Contact(tenant=tenant, name=f'客户{i}', phone=f'13{rng.randint(0, 10**9 - 1):09d}', balance=_money(rng, -5000, 5000) if rng.random() < 0.3 else 0)
+            for i in range(contacts)], batch_size=SEED_BATCH)
+        step(f'客户 {len(people)}')
+
+        cats = [c for c, _ in Product.TYPE_CHOICES]
+        goods = Product.objects.bulk_create([
+            Product(tenant=tenant, zencode=f'BM{i:06d}', name=f'压测商品{i}', category=rng.choice(cats), cost_price=_money(rng, 100, 5000),
+                    retail_price=_money(rng, 200, 8000), need_sn=rng.random() < 0.5)
+            for i in range(products)], batch_size=SEED_BATCH)
+        states = ['IN_STOCK'] * 7 + ['SOLD'] * 2 + ['RENTED']
+        items = StockItem.objects.bulk_create([
+            StockItem(tenant=tenant, product=p, sn=f'BM{tag}-{p.id}-{j}', real_cost=p.cost_price, status=rng.choice(states),
+                      supplier=rng.choice(people) if people else None)
+            for p in goods for j in range(units)], batch_size=SEED_BATCH)
+        step(f'商品 {len(goods)} / 库存 {len(items)}')
+
+        types = ['SALE'] * 6 + ['BUY'] * 2 + ['RENT', 'OTHER']
+        txs = [Transaction(tenant=tenant, contact=rng.choice(people) if people else None, product=rng.choice(goods) if goods else None,
+                           account=rng.choice(accounts), amount=_money(rng, 50, 8000), type=rng.choice(types), operator=rng.choice(staff), remark='压测流水')
+               for _ in range(transactions)]
+        for t in txs:
+            if t.type == 'SALE' and t.product: t.cost = t.product.cost_price
+        txs = Transaction.objects.bulk_create(txs, batch_size=SEED_BATCH)
+        # created_at 为 auto_now_add，插入后按天分组改写，使流水均匀分布在近 days 天
+        by_day = {}
+        for t in txs: by_day.setdefault(rng.randrange(days), []).append(t.id)
+        for d, ids in by_day.items():
+            when = now - timedelta(days=d, seconds=rng.randrange(86400))
+            for i in range(0, len(ids), SEED_BATCH): Transaction.objects.filter(id__in=ids[i:i + SEED_BATCH]).update(created_at=when)
+        DailyRollup.objects.bulk_create(rollup_rows_from_ledger(Transaction.objects.filter(tenant=tenant)), batch_size=SEED_BATCH)
+        step(f'流水 {len(txs)} ({days} 天)')
+
+        rented = [s for s in items if s.status == 'RENTED'] or items
+        today = timezone.localdate()
+        contracts = [
+            RentalContract(tenant=tenant, contact=rng.choice(people), product_id=s.product_id, stock_item=s, operator=rng.choice(staff),
+                           start_date=today - timedelta(days=rng.randrange(days)), duration=rng.choice((1, 3, 6, 12)),
+                           deposit_amount=_money(rng, 0, 2000), rent_price=_money(rng, 100, 1000), is_active=rng.random() < 0.8)
+            for s in (rng.choice(rented) for _ in range(rentals if people and rented else 0))]
+        for c in contracts: c.due_date, c.next_bill_date = rental_schedule(c.start_date, c.duration, c.billed_periods)  # bulk_create 不走 save()
+        RentalContract.objects.bulk_create(contracts, batch_size=SEED_BATCH)
+        step(f'租赁合同 {rentals}')
+    return tenant, admin
+
+def seed_scale(name, **overrides):
+    if name not in SCALES: raise ValueError(f'未知规模 {name}，可选 {", ".join(SCALES)}')
+    return {**SCALES[name], **{k: v for k, v in overrides.items() if v is not None}}
+
+def hot_products(tenant, count, units, cost=Decimal('100')):
+    """热点商品：count 个商品各 units 台在库，模拟多个店员同时卖同一款"""
+    goods = Product.objects.bulk_create([Product(tenant=tenant, zencode=f'BMHOT{i}', name=f'压测热销{i}', category='PH', cost_price=cost) for i in range(count)])
+    StockItem.objects.bulk_create([StockItem(tenant=tenant, product=p, sn=f'BMHOT-{p.id}-{j}', real_cost=cost) for p in goods for j in range(units)], batch_size=SEED_BATCH)
+    return goods
+
+def bench_fixtures(tenant, sell_units):
+    """写接口压测用的固定对象：专供销售扣减的商品 (sell_units 台库存)、客户、账户"""
+    return {'sell_product': hot_products(tenant, 1, sell_units)[0].id,
+            'contact': Contact.objects.filter(tenant=tenant).values_list('id', flat=True).first() or Contact.objects.create(tenant=tenant, name='散客').id,
+            'account': CapitalAccount.objects.filter(tenant=tenant).values_list('id', flat=True).first()}
+
+# 接口清单：名称 -> (方法, 路径, 请求体)，路径/请求体可引用 bench_fixtures 的键
+ENDPOINTS = {
+    'products.list':        ('GET',  '/api/products/?page_size=50', None),
+    'stock_items.list':     ('GET',  '/api/stock-items/?page_size=50', None),
+    'contacts.list':        ('GET',  '/api/contacts/?page_size=50', None),
+    'rentals.list':         ('GET',  '/api/rentals/?page_size=50', None),
+    'products.create':      ('POST', '/api/products/', {'name': '压测入库', 'category': 'ZX', 'quantity': 10, 'cost_price': '88', 'supplier_id': '{contact}', 'account_id': '{account}', 'paid_amount': '500'}),
+    'products.sell':        ('POST', '/api/products/{sell_product}/sell/', {'quantity': 1, 'price': '199', 'received_amount': '150', 'contact_id': '{contact}', 'account_id': '{account}'}),
+    'analysis.dashboard':   ('GET',  '/api/analysis/dashboard/', None),
+    'analysis.accounting':  ('GET',  '/api/analysis/accounting/', None),
+    'analysis.profit':      ('GET',  '/api/analysis/profit_dashboard/', None),
+    'analysis.monthly':     ('GET',  '/api/analysis/monthly/', None),
+    'analysis.account':     ('GET',  '/api/analysis/account_history/?id={account}', None),
+}
+COLD_CACHE = {'analysis.dashboard'}  # 每次请求前清掉看板缓存，测的是聚合本身而不是缓存命中
+
+def resolve(template, fixtures):
+    """把 ENDPOINTS 中的 {键} 占位替换成 bench_fixtures 的实际 id"""
+    if isinstance(template, dict): return {k: resolve(v, fixtures) for k, v in template.items()}
+    return template.format(**fixtures) if isinstance(template, str) else template
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.analytics import day_start, TYPE_NAMES
+from core.models import StockItem
+
+# ==========================================
+# 📤 数据导出 (库存 / 流水 / 客户)
+# ==========================================
+EXPORT_CHUNK = 2000  # 每次从服务端游标取回的行数
+STOCK_STATUS_NAMES = dict(StockItem.STATUS_CHOICES)
+
+def _fmt_time(dt): return timezone.localtime(dt).strftime('%Y-%m-%d %H:%M:%S') if dt else ''
+
+# 每个导出 = (表头, values_list 字段, 行转换)；只取需要的列，逐行转成元组，不构造模型对象
+EXPORTS = {
+    'stock': (
+        ['ID', '商品', '编码', '序列号/IMEI', '状态', '入库价', '供应商', '备注', '入库时间'],
+        ('id', 'product__name', 'product__zencode', 'sn', 'status', 'real_cost', 'supplier__name', 'note', 'in_time'),
+        lambda r: (*r[:4], STOCK_STATUS_NAMES.get(r[4], r[4]), r[5], r[6] or '', r[7], _fmt_time(r[8])),
+    ),
+    'transactions': (
+        ['ID', '时间', '类型', '金额', '关联方', '商品', '账户', '经手人', '摘要'],
+        ('id', 'created_at', 'type', 'amount', 'contact__name', 'product__name', 'account__name', 'operator__first_name', 'remark'),
+        lambda r: (r[0], _fmt_time(r[1]), TYPE_NAMES.get(r[2], r[2]), r[3], *(x or '' for x in r[4:7]), '系统' if r[7] is None else r[7], r[8]),
+    ),
+    'contacts': (
+        ['ID', '姓名', '电话', '地址/档口', '余额'],
+        ('id', 'name', 'phone', 'address', 'balance'),
+        lambda r: r,
+    ),
+}
+
+# 各导出的时间字段 (start_date/end_date 过滤用)
+DATE_FIELDS = {'stock': 'in_time', 'transactions': 'created_at'}
+
+def filter_export(kind, qs, params):
+    """按查询参数过滤：start_date/end_date (含当天)、status (库存)、type (流水)、balance=receivable|payable (客户)"""
+    date_field = DATE_FIELDS.get(kind)
+    start = parse_date(params.get('start_date') or ''); end = parse_date(params.get('end_date') or '')
+    if date_field and start: qs = qs.filter(**{f'{date_field}__gte': day_start(start)})
+    if date_field and end: qs = qs.filter(**{f'{date_field}__lt': day_start(end + timedelta(days=1))})
+    if kind == 'stock' and params.get('status') not in (None, '', 'ALL'): qs = qs.filter(status=params['status'])
+    if kind == 'transactions' and params.get('type') not in (None, '', 'ALL'): qs = qs.filter(type=params['type'])
+    if kind == 'contacts' and params.get('balance') == 'receivable': qs = qs.filter(balance__gt=0)
+    if kind == 'contacts' and params.get('balance') == 'payable': qs = qs.filter(balance__lt=0)
+    return qs
+
+def export_rows(kind, qs):
+    """惰性产出导出行：PostgreSQL 上 iterator() 走服务端游标，内存占用与总行数无关"""
+    _, fields, convert = EXPORTS[kind]
+    return (convert(r) for r in qs.order_by('id').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK))
@@ -0,0 +1,97 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from core.models import Product
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 🖼️ 商品图片处理 (压缩 / 缩略图 / 去 EXIF / 按内容去重)
+# ==========================================
+# 存储布局 (按原图 sha256 寻址，同一张照片只存一份)：
+#   img/ab/<sha>.jpg          正图，长边 ≤ MAIN_MAX，已按 EXIF 转正并去掉全部元数据
+#   img/ab/<sha>_thumb.webp   列表缩略图，THUMB_SIZE 正方形裁切
+MAIN_MAX = 1600
+THUMB_SIZE = 240
+THUMB_EXT = 'webp' if features.check('webp') else 'jpg'
+IMAGE_POOL = ThreadPoolExecutor(max_workers=settings.ZEN_IMAGE_WORKERS, thread_name_prefix='zen-image')
+
+class ImageFormatError(Exception):
+    pass
+
+def image_base(digest): return f"img/{digest[:2]}/{digest}"
+
+def thumb_name(image_name):
+    """正图路径 -> 缩略图路径；旧图 (非内容寻址) 没有缩略图，返回 None"""
+    if not image_name or not image_name.startswith('img/'): return None
+    return image_name.rsplit('.', 1)[0] + f'_thumb.{THUMB_EXT}'
+
+def _encode(img, fmt, **kw):
+    buf = io.BytesIO(); img.save(buf, fmt, **kw); return ContentFile(buf.getvalue())
+
+def _save(name, content):
+    if not default_storage.exists(name): default_storage.save(name, content)
+
+def render_image(src, digest):
+    """解码一次，产出正图 + 缩略图 (JPEG 先用 draft 按比例降采样解码，大图省内存和时间)；返回正图路径"""
+    base = image_base(digest)
+    with Image.open(src) as im:
+        im.draft('RGB', (MAIN_MAX, MAIN_MAX))
+        im = ImageOps.exif_transpose(im).convert('RGB')  # 转正后重新编码，EXIF/GPS 等元数据不会写回
+        main = im.copy(); main.thumbnail((MAIN_MAX, MAIN_MAX), Image.LANCZOS)
+        thumb = ImageOps.fit(im, (THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+    _save(f'{base}_thumb.{THUMB_EXT}', _encode(thumb, THUMB_EXT.replace('jpg', 'jpeg').upper(), quality=80))
+    _save(f'{base}.jpg', _encode(main, 'JPEG', quality=85, optimize=True, progressive=True))
+    return f'{base}.jpg'
+
+def _spool_path(product_id, digest): return os.path.join(settings.ZEN_IMAGE_SPOOL, f'{product_id}-{digest}')
+
+def process_spooled(path):
+    """后台线程：处理暂存的原图并挂到商品上，成功后删除暂存文件 (失败保留，process_images 命令可重试)"""
+    try:
+        product_id, digest = os.path.basename(path).split('-', 1)
+        Product.objects.filter(id=product_id).update(image=render_image(path, digest))
+        os.remove(path)
+    except Exception:
+        logger.exception('图片处理失败: %s', path)
+    finally:
+        connection.close()  # 图片线程不常驻数据库连接
+
+def attach_product_image(product, upload):
+    """请求线程只做：算哈希 (或命中已有图片直接复用)；事务提交后才暂存原图并交给后台线程压缩/出缩略图，回滚 (如入库失败) 不留暂存文件。
+    后台队列在进程内：worker 轮换时 gunicorn.conf.py 的 worker_exit 会等队列处理完；被强杀/崩溃丢掉的任务暂存文件仍在，process_images 命令补处理。
+    返回 True = 已就绪 (命中去重)，False = 处理中"""
+    try:
+        with Image.open(upload) as im: im.verify()  # 只读文件头，挡掉非图片
+    except Exception: raise ImageFormatError('图片无法识别，请上传 JPG/PNG/WEBP 等常见格式')
+    upload.seek(0)
+    h = hashlib.sha256()
+    for chunk in upload.chunks(): h.update(chunk)
+    digest = h.hexdigest(); name = f'{image_base(digest)}.jpg'
+    if default_storage.exists(name):
+        Product.objects.filter(id=product.id).update(image=name); product.image.name = name
+        return True
+    path = _spool_path(product.id, digest)
+
+    def spool():  # on_commit 在本请求内执行，上传文件仍可读
+        try:
+            os.makedirs(settings.ZEN_IMAGE_SPOOL, exist_ok=True)
+            with open(path, 'wb') as f:
+                for chunk in upload.chunks(): f.write(chunk)
+        except OSError:
+            logger.exception('图片暂存失败: 商品 %s', product.id); return
+        IMAGE_POOL.submit(process_spooled, path)
+    transaction.on_commit(spool)
+    return False
+
+def drain_image_queue():
+    """等后台图片任务全部处理完 (进程退出前调用)"""
+    IMAGE_POOL.shutdown(wait=True)
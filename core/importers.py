@@ -0,0 +1,112 @@
+import csv
+import io
+import os
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import StockItem, SerialNumberFactory
+
+# ==========================================
+# 🏭 序列号工厂：流式导入 (CSV / TXT / XLSX)
+# ==========================================
+IMPORT_BATCH_SIZE = 5000
+SN_MAX_LEN = SerialNumberFactory._meta.get_field('sn').max_length
+HEADER_WORDS = {'sn', 'imei', 'serial', '序列号', 'imei号', '串号'}
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})  # COPY 文本格式的转义 (列分隔符/行尾/反斜杠)
+
+class ImportFormatError(Exception):
+    pass
+
+def _text_stream(f):
+    raw = getattr(f, 'file', f)  # Django UploadedFile -> 底层二进制文件
+    return io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+
+def iter_file_sns(f, filename):
+    """逐行解析上传文件，惰性 yield 原始 SN (不整体读入内存)。
+    TXT：每行可含多个 (空格/逗号分隔)；CSV/XLSX：取表头为 sn/imei 的列，否则取第一列"""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        try: from openpyxl import load_workbook
+        except ImportError: raise ImportFormatError('服务器未安装 openpyxl，暂不支持 xlsx，请另存为 CSV')
+        wb = load_workbook(getattr(f, 'file', f), read_only=True, data_only=True)
+        try: yield from _iter_table((r for r in wb.worksheets[0].iter_rows(values_only=True)))
+        finally: wb.close()
+    elif ext == '.csv':
+        yield from _iter_table(csv.reader(_text_stream(f)))
+    elif ext in ('.txt', ''):
+        for line in _text_stream(f):
+            yield from line.replace(',', ' ').replace('，', ' ').split()
+    else:
+        raise ImportFormatError(f'不支持的文件类型: {ext}')
+
+def _iter_table(rows):
+    col = 0
+    for i, row in enumerate(rows):
+        cells = [str(c).strip() if c is not None else '' for c in row]
+        if i == 0:
+            hits = [j for j, c in enumerate(cells) if c.lower() in HEADER_WORDS]
+            if hits: col = hits[0]; continue
+        if col < len(cells): yield cells[col]
+
+def clean_sns(raw_sns, stats):
+    """去空白、丢弃表头词/超长值，统计读取与无效行数"""
+    for sn in raw_sns:
+        sn = str(sn).strip()
+        if not sn or sn.lower() in HEADER_WORDS: continue
+        stats['read'] += 1
+        if len(sn) > SN_MAX_LEN or '\x00' in sn: stats['invalid'] += 1; continue  # PostgreSQL 文本不能含 NUL
+        yield sn
+
+def _batches(it, size):
+    batch = []
+    for x in it:
+        batch.append(x)
+        if len(batch) >= size: yield batch; batch = []
+    if batch: yield batch
+
+def import_serial_numbers(tenant, raw_sns, src_type='import', batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """把 SN 流分批导入序列号工厂。文件内去重，并剔除该租户库存里已有的 SN 与工厂里已有的 SN。
+    PostgreSQL：分批 COPY 进临时表，最后一条 INSERT ... SELECT DISTINCT 去重落库；其他数据库：分批 bulk_create。
+    progress(stats) 每批回调一次；返回 stats = {read, invalid, unique, in_stock, existed, inserted}"""
+    stats = {'read': 0, 'invalid': 0, 'unique': 0, 'in_stock': 0, 'existed': 0, 'inserted': 0}
+    sns = clean_sns(raw_sns, stats)
+    with transaction.atomic():
+        if connection.vendor == 'postgresql': _import_pg(tenant, sns, src_type, batch_size, progress, stats)
+        else: _import_orm(tenant, sns, src_type, batch_size, progress, stats)
+    return stats
+
+def _import_pg(tenant, sns, src_type, batch_size, progress, stats):
+    factory, stock = SerialNumberFactory._meta.db_table, StockItem._meta.db_table
+    with connection.cursor() as cur:
+        cur.execute("CREATE TEMP TABLE zen_sn_import (sn varchar(%s)) ON COMMIT DROP" % SN_MAX_LEN)
+        for batch in _batches(sns, batch_size):
+            buf = io.StringIO(''.join(sn.translate(COPY_ESCAPES) + '\n' for sn in batch))
+            cur.copy_expert("COPY zen_sn_import (sn) FROM STDIN", buf)
+            if progress: progress(stats)
+        cur.execute(
+            f"SELECT count(*),"
+            f" count(*) FILTER (WHERE EXISTS (SELECT 1 FROM {stock} s WHERE s.tenant_id = %s AND s.sn = u.sn)),"
+            f" count(*) FILTER (WHERE NOT EXISTS (SELECT 1 FROM {stock} s WHERE s.tenant_id = %s AND s.sn = u.sn)"
+            f"   AND EXISTS (SELECT 1 FROM {factory} f WHERE f.tenant_id = %s AND f.sn = u.sn))"
+            f" FROM (SELECT DISTINCT sn FROM zen_sn_import) u", [tenant.id, tenant.id, tenant.id])
+        stats['unique'], stats['in_stock'], stats['existed'] = cur.fetchone()
+        cur.execute(
+            f"INSERT INTO {factory} (tenant_id, sn, status, src_type, create_time)"
+            f" SELECT %s, u.sn, 'normal', %s, %s FROM (SELECT DISTINCT sn FROM zen_sn_import) u"
+            f" WHERE NOT EXISTS (SELECT 1 FROM {stock} s WHERE s.tenant_id = %s AND s.sn = u.sn)"
+            f" AND NOT EXISTS (SELECT 1 FROM {factory} f WHERE f.tenant_id = %s AND f.sn = u.sn)",
+            [tenant.id, src_type, timezone.now(), tenant.id, tenant.id])
+        stats['inserted'] = cur.rowcount
+
+def _import_orm(tenant, sns, src_type, batch_size, progress, stats):
+    seen = set()
+    for batch in _batches(sns, batch_size):
+        fresh = [sn for sn in dict.fromkeys(batch) if sn not in seen]
+        seen.update(fresh); stats['unique'] += len(fresh)
+        in_stock = set(StockItem.objects.filter(tenant=tenant, sn__in=fresh).values_list('sn', flat=True))
+        existed = set(SerialNumberFactory.objects.filter(tenant=tenant, sn__in=fresh).values_list('sn', flat=True)) - in_stock
+        stats['in_stock'] += len(in_stock); stats['existed'] += len(existed)
+        rows = [SerialNumberFactory(tenant=tenant, sn=sn, src_type=src_type) for sn in fresh if sn not in in_stock and sn not in existed]
+        SerialNumberFactory.objects.bulk_create(rows, batch_size=1000)
+        stats['inserted'] += len(rows)
+        if progress: progress(stats)
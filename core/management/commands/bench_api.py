@@ -0,0 +1,119 @@
+import json
+import re
+import statistics
+import time
+import tracemalloc
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.analytics import dashboard_cache_key
+from core.benchdata import SCALES, ENDPOINTS, COLD_CACHE, seed_scale, seed_tenant, bench_fixtures, resolve
+from core.tenancy import tenant_cache_key
+from core.auth import user_cache_key
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = ('核心接口基准：批量造一个合成租户，进程内逐个接口计时，记录 p50/p95 延迟、SQL 条数、峰值内存；'
+            '--save 写基线 JSON，--compare 与基线对比并标出退化 (结束后删除临时租户)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='small', choices=list(SCALES), help='数据规模预设')
+        for key in ('products', 'units', 'contacts', 'transactions', 'rentals', 'days'):
+            parser.add_argument(f'--{key}', type=int, help=f'覆盖预设的 {key}')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子 (同种子数据分布一致)')
+        parser.add_argument('--runs', type=int, default=30, help='每个接口计时次数 (另有 2 次预热)')
+        parser.add_argument('--only', help='只测指定接口，逗号分隔 (如 products.list,products.sell)')
+        parser.add_argument('--save', metavar='PATH', help='把结果写成基线 JSON')
+        parser.add_argument('--compare', metavar='PATH', help='与基线 JSON 对比，有退化则返回失败')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='延迟/内存允许的相对增幅 (默认 20%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0, help='延迟绝对增量低于此值不算退化 (抗抖动)')
+        parser.add_argument('--keep', action='store_true', help='保留合成租户 (默认结束后删除)')
+
+    def handle(self, *args, **opts):
+        names = opts['only'].split(',') if opts['only'] else list(ENDPOINTS)
+        unknown = [n for n in names if n not in ENDPOINTS]
+        if unknown: raise CommandError(f"未知接口 {', '.join(unknown)}，可选 {', '.join(ENDPOINTS)}")
+        baseline = self.load(opts['compare']) if opts['compare'] else None
+        scale = seed_scale(opts['scale'], **{k: opts[k] for k in ('products', 'units', 'contacts', 'transactions', 'rentals', 'days')})
+
+        self.stdout.write(f"数据库 {connection.vendor}，规模 {opts['scale']} {scale}，种子 {opts['seed']}")
+        t0 = time.perf_counter()
+        tenant, admin = seed_tenant(**scale, seed=opts['seed'], log=lambda m: self.stdout.write(f'  造数 {m}'))
+        self.stdout.write(f"  造数完成 {time.perf_counter() - t0:.1f}s")
+        try:
+            fixtures = bench_fixtures(tenant, sell_units=opts['runs'] + 3)  # 预热 2 + 计时 + 内存 1
+            admin.is_staff = True; admin.save(update_fields=['is_staff'])  # Server-Timing 只发给工作人员
+            client = Client(); client.force_login(admin)
+            with override_settings(ZEN_PROFILE=True, ZEN_SLOW_REQUEST_MS=10**9):  # 借 Server-Timing 取 SQL 条数 (含并发线程池)，不写慢日志
+                results = {name: self.measure(client, name, fixtures, opts['runs'], tenant.id) for name in names}
+        finally:
+            if opts['keep']: self.stdout.write(f"保留合成租户 {tenant.id}，登录名 {admin.username}")
+            else:
+                cache.delete_many([tenant_cache_key(tenant.id), user_cache_key(admin.id), dashboard_cache_key(tenant.id)]); tenant.delete()
+
+        self.stdout.write(f"{'接口':<22}{'p50 ms':>9}{'p95 ms':>9}{'SQL':>6}{'峰值 KB':>10}")
+        for name, r in results.items():
+            self.stdout.write(f"{name:<22}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['queries']:>6}{r['peak_kb']:>10.0f}")
+
+        if opts['save']:
+            with open(opts['save'], 'w', encoding='utf-8') as f:
+                json.dump({'meta': {'created': timezone.now().isoformat(), 'vendor': connection.vendor, 'scale': opts['scale'], 'params': scale,
+                                    'seed': opts['seed'], 'runs': opts['runs']}, 'endpoints': results}, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"基线已写入 {opts['save']}"))
+        if baseline: self.compare(baseline, results, scale, opts)
+
+    def request(self, client, method, path, body):
+        if method == 'GET': return client.get(path)
+        return client.post(path, data=json.dumps(body), content_type='application/json')
+
+    def measure(self, client, name, fixtures, runs, tenant_id):
+        method, path, body = ENDPOINTS[name]
+        path, body = resolve(path, fixtures), resolve(body, fixtures)
+        cold = name in COLD_CACHE
+        def call():
+            if cold: cache.delete(dashboard_cache_key(tenant_id))
+            resp = self.request(client, method, path, body)
+            if resp.status_code >= 400: raise CommandError(f"{name} 返回 {resp.status_code}: {resp.content[:300]!r}")
+            return resp
+        for _ in range(2): call()
+        timings = []; queries = 0
+        for _ in range(runs):
+            t = time.perf_counter(); resp = call(); timings.append((time.perf_counter() - t) * 1000)
+            m = QUERIES.search(resp.get('Server-Timing', '')); queries = max(queries, int(m.group(1)) if m else 0)
+        # 峰值内存单独测一次 (tracemalloc 本身会拖慢计时)
+        tracemalloc.start()
+        try: call(); _, peak = tracemalloc.get_traced_memory()
+        finally: tracemalloc.stop()
+        timings.sort()
+        return {'p50_ms': round(statistics.median(timings), 2), 'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+                'queries': queries, 'peak_kb': round(peak / 1024, 1)}
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError) as e: raise CommandError(f'基线文件读取失败: {e}')
+
+    def compare(self, baseline, results, scale, opts):
+        meta = baseline.get('meta', {})
+        if meta.get('params') != scale or meta.get('vendor') != connection.vendor:
+            self.stdout.write(self.style.WARNING(f"基线规模/数据库不同 ({meta.get('vendor')} {meta.get('params')})，对比仅供参考"))
+        tol, min_delta = opts['tolerance'], opts['min_delta_ms']
+        regressions = []
+        for name, now in results.items():
+            old = baseline.get('endpoints', {}).get(name)
+            if not old: self.stdout.write(f"  {name}: 基线中没有，跳过"); continue
+            for key in ('p50_ms', 'p95_ms'):
+                if now[key] > old[key] * (1 + tol) and now[key] - old[key] >= min_delta:
+                    regressions.append(f"{name} {key} {old[key]} -> {now[key]}")
+            if now['queries'] > old['queries']: regressions.append(f"{name} SQL {old['queries']} -> {now['queries']} 条")
+            if now['peak_kb'] > old['peak_kb'] * (1 + tol) and now['peak_kb'] - old['peak_kb'] >= 64:
+                regressions.append(f"{name} 峰值内存 {old['peak_kb']} -> {now['peak_kb']} KB")
+        for r in regressions: self.stdout.write(self.style.ERROR(f"  退化: {r}"))
+        if regressions: raise CommandError(f"{len(regressions)} 项相对基线退化 (容差 {tol:.0%})")
+        self.stdout.write(self.style.SUCCESS(f"与基线 {opts['compare']} 对比无退化 (容差 {tol:.0%})"))
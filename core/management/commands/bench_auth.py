@@ -0,0 +1,59 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core.auth import issue_token, user_cache_key
+from core.models import Tenant, CustomUser, Contact
+from core.tenancy import tenant_cache_key
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+}
+
+
+class Command(BaseCommand):
+    help = '认证路径压测：同一接口分别用 数据库会话 / 缓存会话 / 签名令牌 访问，对比每请求 SQL 条数与耗时 (结束后删除临时租户)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='每种模式请求次数')
+        parser.add_argument('--path', default='/api/contacts/?page_size=1', help='压测接口')
+
+    def handle(self, *args, **opts):
+        n, path = opts['requests'], opts['path']
+        tag = time.time_ns() % 10**12
+        tenant = Tenant.objects.create(name='bench', owner_name='bench', phone=f'auth{tag}')
+        user = None
+        try:
+            user = CustomUser.objects.create_user(username=f'auth{tag}', password='x', tenant=tenant, role='ADMIN')
+            Contact.objects.create(tenant=tenant, name='散客')
+            self.stdout.write(f"接口 {path}，每种模式 {n} 次 (首个请求预热不计)")
+            # 基线 = 升级前：数据库会话 + 每请求查用户
+            with override_settings(SESSION_ENGINE=SESSION_ENGINES['db']):
+                client = Client(); client.force_login(user, backend='django.contrib.auth.backends.ModelBackend')
+                results = [('基线 (无缓存)', *self.run(client, path, n))]
+            for mode, engine in SESSION_ENGINES.items():
+                with override_settings(SESSION_ENGINE=engine):
+                    client = Client(); client.force_login(user)
+                    results.append((f'会话 {mode}', *self.run(client, path, n)))
+            token_client = Client(HTTP_AUTHORIZATION=f'Zen {issue_token(user)}')
+            results.append(('签名令牌', *self.run(token_client, path, n)))
+
+            base = results[0][1]
+            for name, queries, ms in results:
+                self.stdout.write(f"  {name:<14} 每请求 {queries:.1f} 条 SQL (减少 {base - queries:.1f})，{ms:.2f} ms/请求")
+        finally:
+            cache.delete_many([tenant_cache_key(tenant.id)] + ([user_cache_key(user.id)] if user else [])); tenant.delete()
+
+    def run(self, client, path, n):
+        resp = client.get(path)  # 预热：回填会话/用户/租户缓存
+        assert resp.status_code == 200, resp.content
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            for _ in range(n): client.get(path)
+            elapsed = time.perf_counter() - t0
+        return len(ctx.captured_queries) / n, elapsed * 1000 / n
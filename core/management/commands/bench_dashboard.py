@@ -0,0 +1,36 @@
+import time
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core.analytics import dashboard_queries, accounting_queries
+from core.models import Tenant, Transaction, StockItem, Contact, CapitalAccount, DailyRollup
+from core.parallel import gather_queries
+
+
+class Command(BaseCommand):
+    help = '看板聚合压测：同一租户的看板/资产查询分别 串行 与 并发 执行，对比总耗时与最慢单条'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='租户ID (默认取库存最多的租户)')
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **opts):
+        tenant_id = opts['tenant'] or (StockItem.objects.values('tenant_id').annotate(n=Count('id')).order_by('-n').values_list('tenant_id', flat=True).first())
+        if not tenant_id or not Tenant.objects.filter(id=tenant_id).exists(): raise CommandError('没有可用的租户数据')
+        qs = lambda m: m.objects.filter(tenant_id=tenant_id)
+        suites = {
+            '看板': lambda: dashboard_queries(qs(Transaction), qs(StockItem), qs(Contact), qs(CapitalAccount), qs(DailyRollup)),
+            '资产': lambda: accounting_queries(qs(CapitalAccount), qs(StockItem), qs(Contact)),
+        }
+        self.stdout.write(f"租户 {tenant_id}，每项 {opts['runs']} 轮取最佳")
+        for name, make in suites.items():
+            slowest, serial, parallel = {}, [], []
+            for _ in range(opts['runs']):
+                t0 = time.perf_counter()
+                for key, fn in make().items():
+                    t1 = time.perf_counter(); fn(); slowest[key] = min(slowest.get(key, 1e9), time.perf_counter() - t1)
+                serial.append(time.perf_counter() - t0)
+                t0 = time.perf_counter(); async_to_sync(gather_queries)(make()); parallel.append(time.perf_counter() - t0)
+            worst = max(slowest, key=slowest.get)
+            self.stdout.write(f"  {name}: 串行 {min(serial)*1000:.1f} ms / 并发 {min(parallel)*1000:.1f} ms，最慢单条 {worst} {slowest[worst]*1000:.1f} ms")
@@ -0,0 +1,44 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Tenant, Product
+from core.services import build_inbound_sns, bulk_inbound
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = '批量入库压测：在临时租户下写入 N 台库存并计时，结束后整体回滚 (不留数据)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--units', type=int, default=10000, help='每轮入库台数')
+        parser.add_argument('--runs', type=int, default=3, help='测试轮数')
+        parser.add_argument('--budget', type=float, default=1.0, help='单轮耗时上限(秒)，超出则返回失败')
+        parser.add_argument('--need-sn', action='store_true', help='走 WAIT 占位 (PENDING) 场景')
+
+    def handle(self, *args, **opts):
+        units, budget = opts['units'], opts['budget']
+        self.stdout.write(f"数据库: {connection.vendor}  每轮 {units} 台 x {opts['runs']} 轮")
+        timings = []
+        for run in range(opts['runs']):
+            try:
+                with transaction.atomic():
+                    tenant = Tenant.objects.create(name='bench', owner_name='bench', phone=f"bench{time.time_ns() % 10**12}")
+                    product = Product.objects.create(tenant=tenant, name='压测商品', category='PH')
+                    t0 = time.perf_counter()
+                    sns = build_inbound_sns(units, need_sn=opts['need_sn'])
+                    bulk_inbound(tenant, product, sns, real_cost=Decimal('100.00'), status='PENDING' if opts['need_sn'] else 'IN_STOCK')
+                    timings.append(time.perf_counter() - t0)
+                    raise _Rollback()
+            except _Rollback:
+                pass
+            self.stdout.write(f"  第 {run+1} 轮: {timings[-1]*1000:.0f} ms ({units / timings[-1]:.0f} 台/秒)")
+
+        best = min(timings)
+        if best > budget:
+            raise CommandError(f"最佳 {best:.3f}s 超出预算 {budget:.3f}s")
+        self.stdout.write(self.style.SUCCESS(f"最佳 {best*1000:.0f} ms，预算 {budget*1000:.0f} ms 内"))
@@ -0,0 +1,51 @@
+import multiprocessing
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils.dateparse import parse_date
+
+from core.models import Tenant, RentalContract
+from core.services import bill_rentals
+
+
+def _bill(args):
+    tenant_id, as_of, dry_run = args
+    try: return tenant_id, bill_rentals(tenant_id, as_of, dry_run=dry_run), None
+    except Exception as e: return tenant_id, None, repr(e)
+    finally: connections.close_all()
+
+
+class Command(BaseCommand):
+    help = '租赁月结：所有租户进行中的合同补齐到指定日期应出未出的账期 (RENT 流水 + 客户应收)，多进程按租户并行，可重复运行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='出账截止日 YYYY-MM-DD (默认今天)')
+        parser.add_argument('--tenant', type=int, action='append', help='只处理指定租户 (可多次)')
+        parser.add_argument('--workers', type=int, default=4, help='并行进程数 (1 = 当前进程内串行)')
+        parser.add_argument('--dry-run', action='store_true', help='只计算不写入')
+
+    def handle(self, *args, **opts):
+        try: as_of = parse_date(opts['date']) if opts['date'] else None
+        except ValueError: as_of = None  # 格式对但日期不存在
+        if opts['date'] and not as_of: raise CommandError('日期格式应为 YYYY-MM-DD')
+        tenants = Tenant.objects.filter(is_active=True, id__in=RentalContract.objects.filter(is_active=True).values('tenant_id'))
+        if opts['tenant']: tenants = tenants.filter(id__in=opts['tenant'])
+        jobs = [(tid, as_of, opts['dry_run']) for tid in tenants.order_by('id').values_list('id', flat=True)]
+        if not jobs: self.stdout.write('没有需要出账的租户'); return
+
+        t0 = time.perf_counter()
+        if opts['workers'] > 1 and len(jobs) > 1 and connection.vendor == 'postgresql':  # SQLite 单写者，并行只会互相锁等
+            connections.close_all()  # fork 前断开，子进程各自建连接
+            with multiprocessing.get_context('fork').Pool(min(opts['workers'], len(jobs))) as pool: results = pool.map(_bill, jobs, chunksize=1)
+        else:
+            results = [_bill(j) for j in jobs]
+
+        total = {'contracts': 0, 'periods': 0, 'amount': Decimal('0')}; failed = []
+        for tid, summary, err in results:
+            if err: failed.append(tid); self.stdout.write(self.style.ERROR(f"  租户 {tid} 失败: {err}")); continue
+            if summary['periods']: self.stdout.write(f"  租户 {tid}: {summary['contracts']} 份合同 {summary['periods']} 期 ￥{summary['amount']}")
+            for k in total: total[k] += summary[k]
+        verb = '试算' if opts['dry_run'] else '出账'
+        self.stdout.write(self.style.SUCCESS(f"{verb}完成：{len(jobs)} 个租户，{total['contracts']} 份合同 {total['periods']} 期，合计 ￥{total['amount']}，用时 {time.perf_counter() - t0:.1f}s"))
+        if failed: raise CommandError(f"{len(failed)} 个租户出账失败 (已成功的批次不受影响，修复后重跑即可补齐)")
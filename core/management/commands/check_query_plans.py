@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.queryplans import seed_plan_data, vacuum_plan_tables, drop_plan_data, hot_queries, explain, plan_problem
+
+
+class Command(BaseCommand):
+    help = '热点查询执行计划回归检查：灌入种子数据并 VACUUM ANALYZE 后 EXPLAIN 每条热点查询，未用上预期索引 (或出现顺序扫描) 即失败 (仅 PostgreSQL，结束后删除种子数据)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=20)
+        parser.add_argument('--items', type=int, default=2000, help='每租户库存台数')
+        parser.add_argument('--txs', type=int, default=2000, help='每租户流水笔数')
+        parser.add_argument('--verbose-plans', action='store_true', help='打印完整执行计划')
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(f'当前数据库为 {connection.vendor}，执行计划检查仅支持 PostgreSQL，已跳过'))
+            return
+        failures = []
+        t0 = time.perf_counter()
+        tenants, product, account = seed_plan_data(opts['tenants'], opts['items'], opts['txs'])
+        try:
+            vacuum_plan_tables()
+            self.stdout.write(f"种子数据: {opts['tenants']} 租户 / 每租户 {opts['items']} 库存、{opts['txs']} 流水，用时 {time.perf_counter() - t0:.1f}s")
+            for name, qs, index in hot_queries(tenants[0], product, account):
+                plan = explain(qs); problem = plan_problem(plan, index)
+                mark = self.style.ERROR(problem) if problem else self.style.SUCCESS(index)
+                self.stdout.write(f'  [{mark}] {name}')
+                if opts['verbose_plans'] or problem: self.stdout.write('      ' + plan.replace('\n', '\n      '))
+                if problem: failures.append(name)
+        finally:
+            drop_plan_data(tenants)
+        if failures: raise CommandError(f"{len(failures)} 条热点查询执行计划退化: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('全部热点查询均走预期索引'))
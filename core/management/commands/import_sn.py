@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Tenant
+from core.importers import ImportFormatError, IMPORT_BATCH_SIZE, iter_file_sns, import_serial_numbers
+
+
+class Command(BaseCommand):
+    help = '序列号工厂批量导入：流式解析 CSV/TXT/XLSX，文件内去重并剔除租户已有库存/已导入的 SN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='IMEI 清单文件路径')
+        parser.add_argument('--tenant', type=int, required=True, help='租户ID')
+        parser.add_argument('--src-type', default='import', help='来源标记 (默认 import)')
+        parser.add_argument('--batch', type=int, default=IMPORT_BATCH_SIZE, help='每批行数')
+
+    def handle(self, *args, **opts):
+        tenant = Tenant.objects.filter(id=opts['tenant']).first()
+        if not tenant: raise CommandError(f"租户 {opts['tenant']} 不存在")
+        t0 = time.perf_counter()
+        def progress(stats):
+            self.stdout.write(f"  已读取 {stats['read']} 行 ({stats['read'] / max(time.perf_counter() - t0, 1e-6):.0f} 行/秒)")
+        try:
+            with open(opts['path'], 'rb') as f:
+                stats = import_serial_numbers(tenant, iter_file_sns(f, opts['path']), src_type=opts['src_type'], batch_size=opts['batch'], progress=progress)
+        except (ImportFormatError, OSError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"完成 ({time.perf_counter() - t0:.1f}s)：读取 {stats['read']}，无效 {stats['invalid']}，去重后 {stats['unique']}，"
+            f"已在库存 {stats['in_stock']}，已在工厂 {stats['existed']}，新导入 {stats['inserted']}"))
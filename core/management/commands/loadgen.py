@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import random
+import time
+import urllib.error
+import urllib.request
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum, Max
+
+from core.analytics import dashboard_cache_key
+from core.auth import issue_token, user_cache_key
+from core.benchdata import SCALES, seed_scale, seed_tenant, hot_products
+from core.models import CustomUser, StockItem, Contact, CapitalAccount, Transaction
+from core.tenancy import tenant_cache_key
+
+SCENARIOS = ('inbound', 'sell', 'confirm', 'dashboard')
+DEFAULT_MIX = 'inbound=1,sell=6,confirm=1,dashboard=2'
+COST, PRICE = Decimal('100'), Decimal('150')
+DEADLOCK_MARKERS = (b'deadlock', b'could not serialize')
+
+
+def _http(base, method, path, token, body, timeout):
+    """返回 (状态码, 响应 JSON 或 None)；连接失败/超时返回 (None, None)"""
+    req = urllib.request.Request(base + path, method=method, data=json.dumps(body).encode() if body is not None else None,
+                                 headers={'Authorization': f'Zen {token}', 'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp: raw = resp.read(); code = resp.status
+    except urllib.error.HTTPError as e: raw = e.read(); code = e.code
+    except (urllib.error.URLError, OSError): return None, None
+    try: return code, json.loads(raw)
+    except ValueError: return code, raw[:500]
+
+
+def _worker(job):
+    """单个压测进程 (不碰 Django/数据库，只发 HTTP)：按权重随机挑场景，闭环跑到 duration 秒"""
+    rng = random.Random(job['seed']); n = 0
+    names = [k for k in SCENARIOS if job['mix'].get(k)]; weights = [job['mix'][k] for k in names]
+    stats = {k: {'lat': [], 'ok': 0, 'rejected': 0, 'errors': 0, 'deadlocks': 0, 'lost': 0} for k in names}
+    fx = {'account': Decimal(0), 'contact': Decimal(0), 'inbound': 0, 'pending': 0, 'confirmed': 0, 'sales': 0, 'sns': []}
+    end = time.time() + job['duration']
+    while time.time() < end:
+        name = rng.choices(names, weights)[0]; n += 1
+        product = rng.choice(job['hot']); clerk = rng.choice(job['clerks'])
+        if name == 'inbound':
+            qty = rng.randint(5, 20); paid = COST * qty / 2; need_sn = rng.random() < 0.5
+            req = ('POST', '/api/products/', clerk, {'name': job['hot_names'][product], 'category': 'PH', 'quantity': qty, 'cost_price': str(COST),
+                   'need_sn': need_sn, 'supplier_id': job['contact'], 'account_id': job['account'], 'paid_amount': str(paid)})
+            def apply(data, qty=qty, paid=paid, need_sn=need_sn):
+                fx['account'] -= paid; fx['contact'] -= COST * qty - paid; fx['inbound'] += qty; fx['pending'] += qty if need_sn else 0
+        elif name == 'sell':
+            qty = rng.randint(1, 3); received = PRICE * qty - rng.choice((0, 50))
+            req = ('POST', f'/api/products/{product}/sell/', clerk, {'quantity': qty, 'price': str(PRICE), 'received_amount': str(received),
+                   'contact_id': job['contact'], 'account_id': job['account']})
+            def apply(data, qty=qty, received=received):
+                fx['account'] += received; fx['contact'] += PRICE * qty - received; fx['sales'] += 1; fx['sns'] += data['sns']
+        elif name == 'confirm':
+            sns = [f"LG{job['tag']}-{job['id']}-{n}-{i}" for i in range(rng.randint(1, 5))]
+            req = ('POST', '/api/stock-items/confirm_batch/', clerk, {'product_id': product, 'sns': sns})
+            def apply(data): fx['confirmed'] += data['confirmed']
+        else:
+            req = ('GET', '/api/analysis/dashboard/', job['boss'], None); apply = None
+        method, path, token, body = req
+        t0 = time.perf_counter(); code, data = _http(job['url'], method, path, token, body, job['timeout'])
+        st = stats[name]; st['lat'].append((time.perf_counter() - t0) * 1000)
+        if code is None: st['lost'] += 1  # 结果未知 (请求可能已在服务端提交)
+        elif code < 400:
+            st['ok'] += 1
+            if apply: apply(data)
+        elif code < 500: st['rejected'] += 1  # 业务拒绝，如库存不足
+        else:
+            st['errors'] += 1
+            if any(m in json.dumps(data, ensure_ascii=False).lower().encode() for m in DEADLOCK_MARKERS): st['deadlocks'] += 1
+        if job['think']: time.sleep(rng.uniform(0, job['think']))
+    return stats, fx
+
+
+def _pct(values, p): return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = ('多进程压测：对运行中的实例 (--url，需连同一数据库) 按权重混合 入库/热点销售/批量转正/看板轮询，'
+            '报告吞吐、延迟分位、错误与死锁数，最后核对库存与余额 (结束后删除临时租户)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='被测实例地址')
+        parser.add_argument('--clients', type=int, default=8, help='压测进程数 (每进程一个闭环客户端)')
+        parser.add_argument('--duration', type=float, default=30, help='持续秒数')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'场景权重 (默认 {DEFAULT_MIX})')
+        parser.add_argument('--hot', type=int, default=2, help='热点商品数 (全部店员争抢这几款)')
+        parser.add_argument('--stock', type=int, default=3000, help='每个热点商品初始在库台数')
+        parser.add_argument('--scale', default='small', choices=list(SCALES), help='背景数据规模 (影响看板聚合)')
+        parser.add_argument('--think', type=float, default=0, help='每次请求后随机停顿上限 (秒)')
+        parser.add_argument('--timeout', type=float, default=30, help='单请求超时 (秒)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='保留临时租户')
+
+    def handle(self, *args, **opts):
+        try:
+            mix = {k: float(v) for k, v in (x.split('=') for x in opts['mix'].split(','))}
+        except ValueError: raise CommandError(f"--mix 格式应为 场景=权重,... 可选场景 {', '.join(SCENARIOS)}")
+        if set(mix) - set(SCENARIOS) or not any(mix.values()): raise CommandError(f"--mix 场景只能是 {', '.join(SCENARIOS)}")
+        url = opts['url'].rstrip('/')
+
+        tenant, boss = seed_tenant(**seed_scale(opts['scale']), seed=opts['seed'])
+        clerks = list(CustomUser.objects.filter(tenant=tenant, role='SALES'))
+        try:
+            hot = hot_products(tenant, opts['hot'], opts['stock'], cost=COST)
+            account = CapitalAccount.objects.filter(tenant=tenant).first(); contact = Contact.objects.create(tenant=tenant, name='压测热点客户')
+            if _http(url, 'GET', '/api/analysis/dashboard/', issue_token(boss), None, opts['timeout'])[0] != 200:
+                raise CommandError(f'无法访问 {url} (需先启动服务，且与本命令连同一数据库)')
+            before = self.snapshot(tenant, hot, account, contact)
+            base = {'url': url, 'duration': opts['duration'], 'mix': mix, 'think': opts['think'], 'timeout': opts['timeout'], 'tag': time.time_ns() % 10**9,
+                    'hot': [p.id for p in hot], 'hot_names': {p.id: p.name for p in hot}, 'clerks': [issue_token(u) for u in clerks] or [issue_token(boss)],
+                    'boss': issue_token(boss), 'account': account.id, 'contact': contact.id}
+            jobs = [{**base, 'id': i, 'seed': opts['seed'] * 1000 + i} for i in range(opts['clients'])]
+            self.stdout.write(f"{url}：{opts['clients']} 进程 x {opts['duration']:.0f}s，场景 {mix}，热点商品 {len(hot)} 款 x {opts['stock']} 台")
+            connections.close_all()  # fork 前断开，子进程不继承数据库连接
+            t0 = time.perf_counter()
+            # fork：子进程直接继承已加载的模块 (spawn/forkserver 会在未初始化 Django 的进程里重新导入本模块)
+            with multiprocessing.get_context('fork').Pool(opts['clients']) as pool: outputs = pool.map(_worker, jobs)
+            elapsed = time.perf_counter() - t0
+            self.report(outputs, elapsed)
+            self.reconcile(outputs, before, self.snapshot(tenant, hot, account, contact), tenant, account)
+        finally:
+            if opts['keep']: self.stdout.write(f"保留临时租户 {tenant.id}")
+            else:
+                cache.delete_many([tenant_cache_key(tenant.id), dashboard_cache_key(tenant.id)] + [user_cache_key(u.id) for u in [boss] + clerks]); tenant.delete()
+
+    def snapshot(self, tenant, hot, account, contact):
+        items = StockItem.objects.filter(product__in=hot)
+        return {'account': CapitalAccount.objects.get(id=account.id).current_balance, 'contact': Contact.objects.get(id=contact.id).balance,
+                'items': items.count(), 'sold': items.filter(status='SOLD').count(), 'pending': items.filter(status='PENDING').count(),
+                'tx_id': Transaction.objects.filter(tenant=tenant).aggregate(m=Max('id'))['m'] or 0}
+
+    def report(self, outputs, elapsed):
+        total = sum(st['ok'] + st['rejected'] + st['errors'] + st['lost'] for stats, _ in outputs for st in stats.values())
+        self.stdout.write(f"共 {total} 请求，{elapsed:.1f}s，吞吐 {total / elapsed:.1f} 请求/秒")
+        self.stdout.write(f"{'场景':<10}{'请求':>7}{'成功':>7}{'拒绝':>6}{'错误':>6}{'死锁':>6}{'未知':>6}{'p50':>9}{'p95':>9}{'p99':>9}  ms")
+        for name in SCENARIOS:
+            rows = [stats[name] for stats, _ in outputs if name in stats]
+            if not rows: continue
+            lat = sorted(x for r in rows for x in r['lat']); s = lambda k: sum(r[k] for r in rows)
+            self.stdout.write(f"{name:<10}{len(lat):>7}{s('ok'):>7}{s('rejected'):>6}{s('errors'):>6}{s('deadlocks'):>6}{s('lost'):>6}"
+                              f"{_pct(lat, 0.5):>9.1f}{_pct(lat, 0.95):>9.1f}{_pct(lat, 0.99):>9.1f}")
+
+    def reconcile(self, outputs, before, after, tenant, account):
+        """服务端落库结果 vs 客户端确认成功的请求；另用流水独立核对账户余额"""
+        fx = {k: sum((o[1][k] for o in outputs), Decimal(0) if k in ('account', 'contact') else 0) for k in ('account', 'contact', 'inbound', 'pending', 'confirmed', 'sales')}
+        sns = [sn for _, o in outputs for sn in o['sns']]
+        lost = sum(st['lost'] for stats, _ in outputs for st in stats.values())
+        new_tx = Transaction.objects.filter(tenant=tenant, id__gt=before['tx_id'])
+        ledger = lambda t: new_tx.filter(account=account, type=t).aggregate(s=Sum('amount'))['s'] or 0
+        checks = [
+            ('账户余额 = 新增流水 (收入 - 采购)', after['account'] - before['account'], ledger('SALE') - ledger('BUY'), True),
+            ('销售流水笔数', new_tx.filter(type='SALE').count(), fx['sales'], False),
+            ('账户余额变动', after['account'] - before['account'], fx['account'], False),
+            ('往来余额变动', after['contact'] - before['contact'], fx['contact'], False),
+            ('入库台数', after['items'] - before['items'], fx['inbound'], False),
+            ('已售台数', after['sold'] - before['sold'], len(sns), False),
+            ('售出序列号无重复', len(set(sns)), len(sns), True),
+            ('待入库台数', after['pending'] - before['pending'], fx['pending'] - fx['confirmed'], False),
+        ]
+        failed = 0
+        for name, got, want, strict in checks:
+            if got == want: mark = self.style.SUCCESS('OK')
+            elif lost and not strict: mark = self.style.WARNING('存疑')  # 有请求结果未知，客户端口径无法精确核对
+            else: mark = self.style.ERROR('不一致'); failed += 1
+            self.stdout.write(f"  [{mark}] {name}: {got} (应为 {want})")
+        if lost: self.stdout.write(self.style.WARNING(f"  {lost} 个请求超时/断连，结果未知"))
+        if failed: raise CommandError(f'{failed} 项库存/余额核对失败')
+        self.stdout.write(self.style.SUCCESS('库存与余额核对通过'))
@@ -0,0 +1,35 @@
+import hashlib
+import os
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.images import process_spooled, render_image
+from core.models import Product
+
+
+class Command(BaseCommand):
+    help = '商品图片补处理：重试暂存区里未完成的上传；--backfill 把旧图 (直接上传的原图) 转成压缩正图 + 缩略图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='同时处理历史原图')
+
+    def handle(self, *args, **opts):
+        spool = settings.ZEN_IMAGE_SPOOL
+        pending = sorted(os.listdir(spool)) if os.path.isdir(spool) else []
+        for name in pending: process_spooled(os.path.join(spool, name))
+        left = len(os.listdir(spool)) if pending else 0
+        self.stdout.write(f"暂存区: 处理 {len(pending)} 个，失败 {left} 个")
+        if not opts['backfill']: return
+
+        done = failed = 0
+        legacy = Product.objects.exclude(image='').exclude(image__isnull=True).exclude(image__startswith='img/')
+        for product_id, image in legacy.values_list('id', 'image').iterator():
+            try:
+                with default_storage.open(image, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest(); f.seek(0)
+                    Product.objects.filter(id=product_id).update(image=render_image(f, digest))
+                done += 1
+            except Exception as e:
+                failed += 1; self.stderr.write(f"  商品 {product_id} ({image}): {e}")
+        self.stdout.write(self.style.SUCCESS(f"历史图片: 转换 {done} 个，失败 {failed} 个 (原文件保留)"))
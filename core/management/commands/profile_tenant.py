@@ -0,0 +1,27 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Tenant
+from core.profiling import FLAG_REFRESH, profiled_tenants
+
+
+class Command(BaseCommand):
+    help = '按租户开关详细 SQL 剖析 (N+1 检测、逐请求日志)，到期自动关闭；不带参数列出当前开启的租户'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', type=int, nargs='?', help='租户ID')
+        parser.add_argument('--minutes', type=int, default=30, help='开启时长 (分钟)')
+        parser.add_argument('--off', action='store_true', help='立即关闭')
+
+    def handle(self, *args, **opts):
+        tid = opts['tenant']
+        if tid is not None:
+            # 开关存在租户表上 (update 不触发租户缓存失效，剖析开关也不读租户缓存)，所有进程 FLAG_REFRESH 秒内读到
+            until = None if opts['off'] else timezone.now() + timedelta(minutes=opts['minutes'])
+            if not Tenant.objects.filter(id=tid).update(profile_until=until): raise CommandError(f'租户 {tid} 不存在')
+            self.stdout.write(self.style.SUCCESS(f"租户 {tid} 详细剖析已{'关闭' if opts['off'] else '开启'} (各进程 {FLAG_REFRESH}s 内生效)"))
+        now = timezone.now(); flags = profiled_tenants()
+        for t, until in sorted(flags.items()):
+            self.stdout.write(f"  租户 {t}: 剩余 {int((until - now).total_seconds() // 60)} 分钟")
+        if not flags: self.stdout.write('当前没有开启详细剖析的租户')
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Transaction, DailyRollup
+from core.analytics import rollup_rows_from_ledger
+
+
+class Command(BaseCommand):
+    help = '经营日汇总：从历史流水回填 DailyRollup，或 --verify 校验汇总与流水是否一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='只处理指定租户ID (默认全部)')
+        parser.add_argument('--verify', action='store_true', help='只校验不写入，有差异则返回失败')
+
+    def handle(self, *args, **opts):
+        txs = Transaction.objects.exclude(tenant=None)
+        rollups = DailyRollup.objects.all()
+        if opts['tenant']:
+            txs = txs.filter(tenant_id=opts['tenant']); rollups = rollups.filter(tenant_id=opts['tenant'])
+        expected = rollup_rows_from_ledger(txs)
+
+        if opts['verify']: return self.verify(expected, rollups)
+
+        with transaction.atomic():
+            deleted, _ = rollups.delete()
+            DailyRollup.objects.bulk_create(expected, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f"回填完成：清除 {deleted} 行，写入 {len(expected)} 行"))
+
+    def verify(self, expected, rollups):
+        key = lambda r: (r.tenant_id, r.day, r.type, r.staff_id, r.category)
+        zero = (0, 0, 0)  # (金额, 成本, 笔数)
+        want = {key(r): (r.amount, r.cost, r.count) for r in expected}
+        have = {}
+        for r in rollups:
+            a, c, n = have.get(key(r), zero); have[key(r)] = (a + r.amount, c + r.cost, n + r.count)
+        # 数量为 0 的残留行 (流水被删光) 视为一致
+        diffs = [(k, want.get(k), have.get(k)) for k in set(want) | set(have) if want.get(k, zero) != have.get(k, zero)]
+        for k, w, h in sorted(diffs, key=lambda d: (d[0][0], d[0][1]))[:20]:
+            self.stdout.write(f"  租户{k[0]} {k[1]} {k[2]} 员工{k[3]} 分类{k[4] or '-'}: 流水 {w or zero} / 汇总 {h or zero}")
+        if diffs: raise CommandError(f"{len(diffs)} 组汇总与流水不一致，可运行 rollup_sales 重新回填")
+        self.stdout.write(self.style.SUCCESS(f"校验通过：{len(want)} 组汇总与流水一致"))
@@ -0,0 +1,71 @@
+import threading
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Tenant, CustomUser, Product, Contact, CapitalAccount, Transaction, StockItem
+from core.services import bulk_inbound
+from core.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = '记账并发压测：N 个线程同时对同一账户/同一客户调用销售接口，校验余额无丢失更新 (仅 PostgreSQL，结束后删除临时租户)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sellers', type=int, default=32, help='并发销售线程数')
+        parser.add_argument('--sales', type=int, default=20, help='每线程销售单数')
+        parser.add_argument('--price', default='99.50', help='单价')
+        parser.add_argument('--received', default='60.25', help='每单实收 (其余记客户欠款)')
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(f'当前数据库为 {connection.vendor}，行锁并发压测仅支持 PostgreSQL，已跳过'))
+            return
+        sellers, sales = opts['sellers'], opts['sales']
+        price, received = Decimal(opts['price']), Decimal(opts['received'])
+        tag = time.time_ns() % 10**12
+        tenant = Tenant.objects.create(name='stress', owner_name='stress', phone=f'stress{tag}', account_limit=1)
+        try:
+            user = CustomUser.objects.create_user(username=f'stress{tag}', password='x', tenant=tenant, role='ADMIN')
+            product = Product.objects.create(tenant=tenant, name='压测商品', category='PH')
+            account = CapitalAccount.objects.create(tenant=tenant, name='现金账户', initial_balance=0, current_balance=0)
+            contact = Contact.objects.create(tenant=tenant, name='压测客户')
+            bulk_inbound(tenant, product, [f'STRESS-{tag}-{i}' for i in range(sellers * sales)], real_cost=Decimal('50'))
+
+            view = ProductViewSet.as_view({'post': 'sell'}); factory = APIRequestFactory()
+            errors = []; start = threading.Barrier(sellers)
+            def seller():
+                try:
+                    start.wait()
+                    for _ in range(sales):
+                        req = factory.post(f'/api/products/{product.id}/sell/', {'quantity': 1, 'price': str(price), 'received_amount': str(received), 'contact_id': contact.id, 'account_id': account.id}, format='json')
+                        force_authenticate(req, user=user)
+                        resp = view(req, pk=product.id)
+                        if resp.status_code != 200: errors.append(resp.data)
+                finally:
+                    connections.close_all()
+            threads = [threading.Thread(target=seller) for _ in range(sellers)]
+            t0 = time.perf_counter()
+            for t in threads: t.start()
+            for t in threads: t.join()
+            elapsed = time.perf_counter() - t0
+
+            total = sellers * sales
+            account.refresh_from_db(); contact.refresh_from_db()
+            checks = [
+                ('销售流水笔数', Transaction.objects.filter(tenant=tenant, type='SALE').count(), total),
+                ('已售台数', StockItem.objects.filter(tenant=tenant, status='SOLD').count(), total),
+                ('账户余额', account.current_balance, received * total),
+                ('客户欠款', contact.balance, (price - received) * total),
+            ]
+            self.stdout.write(f"{sellers} 线程 x {sales} 单 = {total} 单，用时 {elapsed:.1f}s ({total / elapsed:.0f} 单/秒)，失败 {len(errors)} 单")
+            for name, got, want in checks:
+                mark = self.style.SUCCESS('OK') if got == want else self.style.ERROR('丢失更新')
+                self.stdout.write(f"  [{mark}] {name}: {got} (应为 {want})")
+            if errors: self.stdout.write(f'  首个错误: {errors[0]}')
+            if errors or any(got != want for _, got, want in checks): raise CommandError('并发记账校验失败')
+            self.stdout.write(self.style.SUCCESS('并发记账无丢失更新'))
+        finally:
+            tenant.delete()
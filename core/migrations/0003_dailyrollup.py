@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_product_need_sn_alter_stockitem_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日期')),
+                ('type', models.CharField(choices=[('SALE', '销售收入'), ('RENT', '租金/押金'), ('BUY', '采购支出'), ('OTHER', '其他')], max_length=10, verbose_name='类型')),
+                ('staff_id', models.BigIntegerField(default=0, verbose_name='经手人ID(0=系统)')),
+                ('category', models.CharField(blank=True, default='', max_length=2, verbose_name='商品分类')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='金额合计')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='成本合计(销售)')),
+                ('count', models.IntegerField(default=0, verbose_name='笔数')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tenant', verbose_name='所属租户')),
+            ],
+            options={
+                'verbose_name': '📈 经营日汇总',
+                'verbose_name_plural': '📈 经营日汇总',
+                'unique_together': {('tenant', 'day', 'type', 'staff_id', 'category')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockitem',
+            index=models.Index(condition=models.Q(('status', 'IN_STOCK')), fields=['tenant', 'product', 'id'], name='stock_fifo_instock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockitem',
+            index=models.Index(fields=['tenant', 'status'], include=('real_cost',), name='stock_tenant_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockitem',
+            index=models.Index(fields=['tenant', 'in_time'], name='stock_tenant_intime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['tenant', 'type', 'created_at'], include=('amount',), name='tx_tenant_type_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'created_at'], name='tx_account_time_idx'),
+        ),
+    ]
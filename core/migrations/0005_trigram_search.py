@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:42
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """GIN + gin_trgm_ops 只有 PostgreSQL 支持：其他数据库只记入迁移状态、不建索引 (否则会退化成一个无用的多列 B 树)，搜索走 icontains"""
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql': super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql': super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),  # PostgreSQL 上需要 contrib 包 (pg_trgm) 已安装；其他数据库为空操作
+        AddPostgresIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name', 'zencode', 'note'], name='product_trgm_idx', opclasses=['gin_trgm_ops', 'gin_trgm_ops', 'gin_trgm_ops']),
+        ),
+        AddPostgresIndex(
+            model_name='stockitem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['sn'], name='stock_sn_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
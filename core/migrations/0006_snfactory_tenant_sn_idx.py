@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serialnumberfactory',
+            index=models.Index(fields=['tenant', 'sn'], name='snfactory_tenant_sn_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_snfactory_tenant_sn_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='序列名')),
+                ('value', models.BigIntegerField(default=0, verbose_name='当前值')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tenant', verbose_name='所属租户')),
+            ],
+            options={
+                'verbose_name': '🔢 编号序列',
+                'verbose_name_plural': '🔢 编号序列',
+                'unique_together': {('tenant', 'name')},
+            },
+        ),
+    ]
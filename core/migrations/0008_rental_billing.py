@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:02
+
+import calendar
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_past_periods_billed(apps, schema_editor):
+    """上线前租金都是手工记 RENT 流水：已到期的期数视为已出账，计费引擎只补上线之后的新账期"""
+    RentalContract = apps.get_model('core', 'RentalContract')
+    today = timezone.localdate(); by_value = {}
+    for c in RentalContract.objects.filter(start_date__lte=today).only('id', 'start_date', 'duration').iterator():
+        n = (today.year - c.start_date.year) * 12 + today.month - c.start_date.month
+        y, m = divmod(c.start_date.month - 1 + n, 12)
+        if c.start_date.replace(year=c.start_date.year + y, month=m + 1, day=min(c.start_date.day, calendar.monthrange(c.start_date.year + y, m + 1)[1])) > today: n -= 1
+        by_value.setdefault(min(c.duration, n + 1), []).append(c.id)
+    for value, ids in by_value.items():
+        for i in range(0, len(ids), 5000): RentalContract.objects.filter(id__in=ids[i:i + 5000]).update(billed_periods=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tenant_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentalcontract',
+            name='billed_periods',
+            field=models.IntegerField(default=0, verbose_name='已出账期数'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalcontract',
+            index=models.Index(fields=['tenant', 'is_active', 'start_date'], name='rental_billing_idx'),
+        ),
+        migrations.RunPython(mark_past_periods_billed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:05
+
+import calendar
+from django.db import migrations, models
+
+
+def _add_months(d, n):
+    y, m = divmod(d.month - 1 + n, 12)
+    return d.replace(year=d.year + y, month=m + 1, day=min(d.day, calendar.monthrange(d.year + y, m + 1)[1]))
+
+def backfill_schedule(apps, schema_editor):
+    """按 起租日/租期/已出账期数 回填 到期日、下次出账日"""
+    RentalContract = apps.get_model('core', 'RentalContract')
+    batch = []
+    for c in RentalContract.objects.only('id', 'start_date', 'duration', 'billed_periods').iterator(chunk_size=2000):
+        c.due_date = _add_months(c.start_date, c.duration)
+        c.next_bill_date = _add_months(c.start_date, c.billed_periods) if c.billed_periods < c.duration else None
+        batch.append(c)
+        if len(batch) >= 2000: RentalContract.objects.bulk_update(batch, ['due_date', 'next_bill_date']); batch = []
+    if batch: RentalContract.objects.bulk_update(batch, ['due_date', 'next_bill_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_rental_billing'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rentalcontract',
+            name='rental_billing_idx',
+        ),
+        migrations.AddField(
+            model_name='rentalcontract',
+            name='due_date',
+            field=models.DateField(blank=True, null=True, verbose_name='到期日'),
+        ),
+        migrations.AddField(
+            model_name='rentalcontract',
+            name='next_bill_date',
+            field=models.DateField(blank=True, null=True, verbose_name='下次出账日'),
+        ),
+        migrations.RunPython(backfill_schedule, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rentalcontract',
+            index=models.Index(fields=['tenant', 'is_active', 'next_bill_date'], name='rental_billing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalcontract',
+            index=models.Index(fields=['tenant', 'is_active', 'due_date'], name='rental_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentalcontract',
+            index=models.Index(fields=['tenant', 'end_date'], name='rental_returned_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_cost(apps, schema_editor):
+    """历史销售流水没有记成本，且无法对应到当时卖出的具体库存，按商品参考成本补记 (与此前汇总口径一致)"""
+    Transaction = apps.get_model('core', 'Transaction')
+    Product = apps.get_model('core', 'Product')
+    Transaction.objects.filter(type='SALE', product__isnull=False).update(
+        cost=Subquery(Product.objects.filter(id=OuterRef('product_id')).values('cost_price')[:1]))
+
+def rebuild_rollups(apps, schema_editor):
+    """按流水重建 DailyRollup：0003 建表时没有回填历史，此后成本口径也改为流水上的 cost"""
+    Transaction = apps.get_model('core', 'Transaction')
+    DailyRollup = apps.get_model('core', 'DailyRollup')
+    rows = (Transaction.objects.exclude(tenant=None)
+            .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+            .values('tenant_id', 'day', 'type', 'operator_id', 'product__category')
+            .annotate(amount=Sum('amount'), cost=Sum('cost', filter=Q(type='SALE')), count=Count('id'))
+            .order_by())
+    DailyRollup.objects.all().delete()
+    DailyRollup.objects.bulk_create((
+        DailyRollup(tenant_id=r['tenant_id'], day=r['day'], type=r['type'], staff_id=r['operator_id'] or 0, category=r['product__category'] or '',
+                    amount=r['amount'] or 0, cost=r['cost'] or 0, count=r['count']) for r in rows.iterator(chunk_size=2000)), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_rental_due_dates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='销售成本'),
+        ),
+        migrations.RunPython(backfill_cost, migrations.RunPython.noop),
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_transaction_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='profile_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='详细剖析截止'),
+        ),
+    ]
@@ -1,4 +1,7 @@
+import calendar
+import datetime
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.utils.html import format_html
@@ -17,6 +20,7 @@ class Tenant(models.Model):
     is_active = models.BooleanField(default=True, verbose_name="状态(审核)")
     account_limit = models.IntegerField(default=5, verbose_name="最大子账户数")
     expire_date = models.DateField(null=True, blank=True, verbose_name="到期时间")
+    profile_until = models.DateTimeField(null=True, blank=True, verbose_name="详细剖析截止")  # profile_tenant 命令维护，见 core/profiling.py
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self): return self.name
@@ -80,7 +84,12 @@ class Product(TenantAwareModel):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="入库时间")
 
     def __str__(self): return self.name
-    class Meta: verbose_name = "📂 商品档案(SPU)"; verbose_name_plural = verbose_name
+    class Meta:
+        verbose_name = "📂 商品档案(SPU)"; verbose_name_plural = verbose_name
+        indexes = [
+            # 模糊搜索 (pg_trgm)：名称/编码/备注任意片段
+            GinIndex(fields=['name', 'zencode', 'note'], opclasses=['gin_trgm_ops'] * 3, name='product_trgm_idx'),
+        ]
 
 class StockItem(TenantAwareModel):
     """【具体库存 (SKU)】"""
@@ -104,6 +113,16 @@ class StockItem(TenantAwareModel):
     class Meta:
         verbose_name = "📦 库存实物(SKU)"; verbose_name_plural = verbose_name
         unique_together = ('tenant', 'sn') 
+        indexes = [
+            # 先进先出出库：只索引在库的行 (已售的历史行不进索引)
+            models.Index(fields=['tenant', 'product', 'id'], condition=models.Q(status='IN_STOCK'), name='stock_fifo_instock_idx'),
+            # 按状态筛选 / 库存货值 (INCLUDE 成本，仅扫索引即可求和)
+            models.Index(fields=['tenant', 'status'], include=['real_cost'], name='stock_tenant_status_idx'),
+            # 今日入库
+            models.Index(fields=['tenant', 'in_time'], name='stock_tenant_intime_idx'),
+            # SN/IMEI 片段与尾号搜索 (pg_trgm)
+            GinIndex(fields=['sn'], opclasses=['gin_trgm_ops'], name='stock_sn_trgm_idx'),
+        ]
 
     def __str__(self): return f"{self.product.name} ({self.sn})"
 
@@ -129,6 +148,17 @@ class Contact(TenantAwareModel):
     def __str__(self): return self.name
     class Meta: verbose_name = "客户/供应商"; verbose_name_plural = verbose_name
 
+def add_months(d, n):
+    """日期加 n 个月 (月末对齐：1/31 + 1 个月 = 2/28 或 2/29)"""
+    y, m = divmod(d.month - 1 + n, 12)
+    y += d.year; m += 1
+    return d.replace(year=y, month=m, day=min(d.day, calendar.monthrange(y, m)[1]))
+
+def rental_schedule(start, duration, billed_periods):
+    """(到期日, 下次出账日)：到期日 = 起租日 + 租期；下次出账日 = 第 billed_periods+1 期起始日，全部出完为 None"""
+    if isinstance(start, datetime.datetime): start = timezone.localdate(start)
+    return add_months(start, duration), add_months(start, billed_periods) if billed_periods < duration else None
+
 class RentalContract(TenantAwareModel):
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE, verbose_name="客户")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="租赁设备")
@@ -147,7 +177,25 @@ class RentalContract(TenantAwareModel):
     expected_profit = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="毛利")
     
     is_active = models.BooleanField(default=True, verbose_name="进行中")
-    class Meta: verbose_name = "租赁合同"; verbose_name_plural = verbose_name
+    billed_periods = models.IntegerField(default=0, verbose_name="已出账期数")  # 月结计费 (core.services.bill_rentals) 维护，保证重复运行不重复出账
+    # 🟢 由 起租日/租期/已出账期数 推算并落库 (save 时维护；批量写入须用 rental_schedule 同步)，到期/逾期/出账都是索引范围查询
+    due_date = models.DateField(null=True, blank=True, verbose_name="到期日")
+    next_bill_date = models.DateField(null=True, blank=True, verbose_name="下次出账日")
+    class Meta:
+        verbose_name = "租赁合同"; verbose_name_plural = verbose_name
+        indexes = [
+            # 月结计费：租户内进行中、下次出账日已到的合同
+            models.Index(fields=['tenant', 'is_active', 'next_bill_date'], name='rental_billing_idx'),
+            # 租赁台：即将到期 / 已逾期
+            models.Index(fields=['tenant', 'is_active', 'due_date'], name='rental_due_idx'),
+            # 租赁台：今日归还
+            models.Index(fields=['tenant', 'end_date'], name='rental_returned_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.due_date, self.next_bill_date = rental_schedule(self.start_date, self.duration, self.billed_periods)
+        if kwargs.get('update_fields') is not None: kwargs['update_fields'] = {*kwargs['update_fields'], 'due_date', 'next_bill_date'}
+        super().save(*args, **kwargs)
 
 class Transaction(TenantAwareModel):
     TYPE_CHOICES = (('SALE', '销售收入'), ('RENT', '租金/押金'), ('BUY', '采购支出'), ('OTHER', '其他'))
@@ -155,11 +203,19 @@ class Transaction(TenantAwareModel):
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="商品")
     account = models.ForeignKey(CapitalAccount, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="账户")
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="金额")
+    cost = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="销售成本")  # 成交时所售库存的真实入库价合计，不随商品参考成本变动
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name="类型")
     operator = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, verbose_name="经手人")
     remark = models.CharField(max_length=200, blank=True, verbose_name="摘要")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="时间")
-    class Meta: verbose_name = "财务流水"; verbose_name_plural = verbose_name
+    class Meta:
+        verbose_name = "财务流水"; verbose_name_plural = verbose_name
+        indexes = [
+            # 看板/利润报表：租户 + 类型 + 时间区间
+            models.Index(fields=['tenant', 'type', 'created_at'], include=['amount'], name='tx_tenant_type_time_idx'),
+            # 账户对账单
+            models.Index(fields=['account', 'created_at'], name='tx_account_time_idx'),
+        ]
 
 # 7. 序列号工厂
 class SerialNumberFactory(TenantAwareModel):
@@ -168,10 +224,33 @@ class SerialNumberFactory(TenantAwareModel):
     src_type = models.CharField(max_length=20, default='import', verbose_name='来源')
     check_result = models.TextField(blank=True, null=True, verbose_name='检测结果')
     create_time = models.DateTimeField(auto_now_add=True)
-    class Meta: verbose_name = "🏭 序列号工厂"; verbose_name_plural = verbose_name
+    class Meta:
+        verbose_name = "🏭 序列号工厂"; verbose_name_plural = verbose_name
+        indexes = [models.Index(fields=['tenant', 'sn'], name='snfactory_tenant_sn_idx')]  # 导入去重
 
     def status_color(self):
         if self.status == 'normal': return format_html('<span style="color:green">✅ 正常</span>')
         elif self.status == 'banned': return format_html('<span style="color:red; font-weight:bold;">🚫 封禁</span>')
         return self.status
-    status_color.short_description = '状态监控'
\ No newline at end of file
+    status_color.short_description = '状态监控'
+# 8. 经营日汇总 (随流水增量维护，报表只读这张小表)
+class DailyRollup(TenantAwareModel):
+    """粒度：租户 x 日 x 类型 x 经手人 x 商品分类；按类型/员工/分类汇总时再 Sum"""
+    day = models.DateField(verbose_name="日期")
+    type = models.CharField(max_length=10, choices=Transaction.TYPE_CHOICES, verbose_name="类型")
+    staff_id = models.BigIntegerField(default=0, verbose_name="经手人ID(0=系统)")
+    category = models.CharField(max_length=2, blank=True, default='', verbose_name="商品分类")
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="金额合计")
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="成本合计(销售)")
+    count = models.IntegerField(default=0, verbose_name="笔数")
+    class Meta:
+        verbose_name = "📈 经营日汇总"; verbose_name_plural = verbose_name
+        unique_together = ('tenant', 'day', 'type', 'staff_id', 'category')
+# 9. 编号序列 (商品编码等发号器)
+class TenantSequence(TenantAwareModel):
+    """每租户每个序列一行计数器 (如 zencode:PH)，value = 已发出的最大号；由 core.services.allocate_seq 原子递增"""
+    name = models.CharField(max_length=50, verbose_name="序列名")
+    value = models.BigIntegerField(default=0, verbose_name="当前值")
+    class Meta:
+        verbose_name = "🔢 编号序列"; verbose_name_plural = verbose_name
+        unique_together = ('tenant', 'name')
@@ -0,0 +1,31 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class TenantCursorPagination(CursorPagination):
+    """游标分页 (按 -id)：并发入库时翻页不重复、不漏行，且不做 OFFSET 扫描。
+    ?page_size= 调整每页条数 (上限 ZEN_MAX_PAGE_SIZE)；?with_count=1 额外返回总数 (需要时才 COUNT)"""
+    ordering = '-id'
+    page_size = getattr(settings, 'ZEN_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'ZEN_MAX_PAGE_SIZE', 1000)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = queryset.count() if request.query_params.get('with_count') in ('1', 'true') else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # 搜索结果按相关度排序：游标取 search_cursor (相关度 + id 的唯一键，见 core/search.py)
+        if 'search_cursor' in queryset.query.annotations: return ('-search_cursor',)
+        return super().get_ordering(request, queryset, view)
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None: body['count'] = self.count
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return schema
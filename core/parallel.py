@@ -0,0 +1,33 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, connections, close_old_connections
+
+from core.profiling import current_profile
+
+# ==========================================
+# ⚡ 并发查询 (看板等多条互不依赖的聚合同时执行)
+# ==========================================
+# 有界线程池：每个线程各用一条数据库连接，并发度 = 连接数上限
+def _init_thread():
+    # 池线程常驻，本线程的连接按 ZEN_QUERY_CONN_MAX_AGE 跨任务复用 (带健康检查)；否则 CONN_MAX_AGE=0 下每条查询都要新建一次连接。
+    # 只改本线程的连接：ASGI 下同步视图每个请求换一个线程，全局开持久连接会泄漏，请求线程仍用 CONN_MAX_AGE=0
+    for conn in connections.all():
+        conn.settings_dict = {**conn.settings_dict, 'CONN_MAX_AGE': settings.ZEN_QUERY_CONN_MAX_AGE, 'CONN_HEALTH_CHECKS': True}
+
+QUERY_POOL = ThreadPoolExecutor(max_workers=settings.ZEN_QUERY_WORKERS, thread_name_prefix='zen-query', initializer=_init_thread)
+
+def _run(fn, prof=None):
+    # 线程池线程不走请求开始/结束信号：每个任务前后回收过期/出错的连接，同普通请求一样
+    close_old_connections()
+    try:
+        if prof is None: return fn()
+        with connection.execute_wrapper(prof): return fn()  # 计入发起请求的 SQL 剖析
+    finally:
+        close_old_connections()
+
+async def gather_queries(fns):
+    """{名称: 无参函数} 并发执行 -> {名称: 结果}；总耗时约等于最慢的一条"""
+    loop = asyncio.get_running_loop(); prof = current_profile.get()
+    results = await asyncio.gather(*(loop.run_in_executor(QUERY_POOL, _run, fn, prof) for fn in fns.values()))
+    return dict(zip(fns, results))
@@ -0,0 +1,128 @@
+import contextvars
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger('zen.profile')
+
+# ==========================================
+# ⏱️ 请求级 SQL 剖析 (Server-Timing / 慢请求日志 / N+1 检测)
+# ==========================================
+# 常开：每条 SQL 只多一次计时 + 最慢 N 条比较；详细模式 (工作人员按请求 ?_profile=1 / X-Zen-Profile: 1，或按租户开启) 才归并 SQL 形状、抓调用位置
+# Server-Timing 头只发给工作人员 (is_staff / 超级管理员)，不向普通客户端暴露 SQL 条数与耗时
+SLOWEST_KEEP = 3
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')  # IN (%s, %s, ...) 长度不同视为同一形状
+PROJECT_ROOT = str(settings.BASE_DIR)
+FLAG_REFRESH = 30  # 租户开关 (Tenant.profile_until) 每进程每 30 秒读一次库，不依赖共享缓存
+
+current_profile = contextvars.ContextVar('zen_profile', default=None)
+
+def _frame_label(f):
+    path = f.f_code.co_filename
+    path = path[len(PROJECT_ROOT) + 1:] if path.startswith(PROJECT_ROOT) else path.split('site-packages/')[-1]
+    return f"{path}:{f.f_lineno} {f.f_code.co_name}"
+
+def call_site():
+    """调用位置：第一个项目内栈帧 (如 core/views.py:83 list)，若 SQL 实际由三方库触发 (如 DRF 字段取值)，附上触发处"""
+    f = sys._getframe(2); inner = project = None
+    while f and not project:
+        path = f.f_code.co_filename
+        if inner is None and '/django/db/' not in path and not path.endswith('profiling.py'): inner = f
+        if path.startswith(PROJECT_ROOT) and not path.endswith('profiling.py') and 'site-packages' not in path: project = f
+        f = f.f_back
+    if not project: return _frame_label(inner) if inner else '?'
+    return _frame_label(project) if inner is None or inner is project else f"{_frame_label(project)} <- {_frame_label(inner)}"
+
+class RequestProfile:
+    """挂在 connection.execute_wrapper 上，统计本请求的 SQL"""
+    def __init__(self, detailed=False):
+        self.detailed = detailed; self.count = 0; self.sql = 0.0
+        self.slowest = []; self.shapes = {}; self.sites = {}; self.spans = {}
+        self.lock = threading.Lock()  # 并发查询线程池 (core.parallel) 也会往这里记
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try: return execute(sql, params, many, context)
+        finally: self.record(sql, time.perf_counter() - t0)
+
+    def record(self, sql, dur):
+        with self.lock:
+            self.count += 1; self.sql += dur
+            if len(self.slowest) < SLOWEST_KEEP or dur > self.slowest[-1][0]:
+                self.slowest.append((dur, sql)); self.slowest.sort(key=lambda x: -x[0]); del self.slowest[SLOWEST_KEEP:]
+            if self.detailed:
+                shape = IN_LIST.sub('(...)', sql)
+                n = self.shapes[shape] = self.shapes.get(shape, 0) + 1
+                if n == settings.ZEN_NPLUSONE_THRESHOLD: self.sites[shape] = call_site()
+
+    def repeated(self):
+        """同一形状执行 ≥ 阈值次：疑似 N+1"""
+        return sorted(({'count': n, 'sql': shape[:300], 'site': self.sites.get(shape, '?')} for shape, n in self.shapes.items() if n >= settings.ZEN_NPLUSONE_THRESHOLD), key=lambda x: -x['count'])
+
+    def server_timing(self, total):
+        parts = [f'sql;dur={self.sql * 1000:.1f};desc="{self.count} queries"']
+        parts += [f'{name};dur={dur * 1000:.1f}' for name, dur in self.spans.items()]
+        repeated = self.repeated() if self.detailed else None
+        if repeated: parts.append(f'nplusone;desc="{len(repeated)} repeated shapes"')
+        return ', '.join(parts + [f'total;dur={total * 1000:.1f}'])
+
+@contextmanager
+def span(name):
+    """记录一段代码的耗时 (扣除其间 SQL 时间)，出现在 Server-Timing 里，如序列化 ser"""
+    prof = current_profile.get()
+    if prof is None:
+        yield; return
+    t0 = time.perf_counter(); sql0 = prof.sql
+    try: yield
+    finally: prof.spans[name] = prof.spans.get(name, 0) + (time.perf_counter() - t0) - (prof.sql - sql0)
+
+_flags = {'at': 0.0, 'tenants': {}}
+
+def profiled_tenants():
+    """{租户id: 剖析截止时间}，只含未到期的"""
+    from core.models import Tenant
+    return dict(Tenant.objects.filter(profile_until__gt=timezone.now()).values_list('id', 'profile_until'))
+
+def tenant_profiled(tenant_id):
+    now = time.time()
+    if now - _flags['at'] > FLAG_REFRESH:
+        _flags['tenants'] = {tid: until.timestamp() for tid, until in profiled_tenants().items()}; _flags['at'] = now
+    return _flags['tenants'].get(tenant_id, 0) > now
+
+def is_staff(user): return bool(user and user.is_authenticated and (user.is_staff or user.is_superuser))
+
+class QueryProfileMiddleware:
+    """放在 TenantMiddleware 之后。工作人员的响应带 Server-Timing；超过 ZEN_SLOW_REQUEST_MS 或详细模式写结构化日志 (logger zen.profile)"""
+    def __init__(self, get_response): self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.ZEN_PROFILE: return self.get_response(request)
+        user = getattr(request, 'user', None); tenant = getattr(request, 'tenant', None)
+        detailed = bool(user and user.is_authenticated and (
+            (is_staff(user) and (request.GET.get('_profile') == '1' or request.headers.get('X-Zen-Profile') == '1')) or (tenant and tenant_profiled(tenant.id))))
+        prof = RequestProfile(detailed); token = current_profile.set(prof)
+        t0 = time.perf_counter()
+        try:
+            with connection.execute_wrapper(prof): response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        total = time.perf_counter() - t0
+        user = getattr(request, 'user', None)  # DRF 令牌认证在视图里才设置 request.user，响应后再取
+        if is_staff(user): response['Server-Timing'] = prof.server_timing(total)
+        if detailed or total * 1000 >= settings.ZEN_SLOW_REQUEST_MS:
+            logger.warning(json.dumps({
+                'event': 'profile' if detailed else 'slow_request', 'method': request.method, 'path': request.get_full_path()[:300],
+                'status': response.status_code, 'tenant': tenant.id if tenant else None, 'user': user.id if user and user.is_authenticated else None,
+                'ms': round(total * 1000, 1), 'sql_ms': round(prof.sql * 1000, 1), 'queries': prof.count,
+                'spans': {k: round(v * 1000, 1) for k, v in prof.spans.items()},
+                'slowest': [{'ms': round(d * 1000, 1), 'sql': s[:500]} for d, s in prof.slowest],
+                'nplusone': prof.repeated() if detailed else None,
+            }, ensure_ascii=False))
+        return response
@@ -0,0 +1,99 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Sum, Count, Q
+from django.utils import timezone
+
+from core.analytics import INCOME_TYPES, TREND_DAYS
+from core.models import Tenant, Product, StockItem, CapitalAccount, Contact, Transaction, DailyRollup
+from core import search  # noqa: F401  注册 __ilike 查询
+
+# ==========================================
+# 🔍 热点查询执行计划检查，供 check_query_plans 命令与测试共用 (仅 PostgreSQL)
+# ==========================================
+HOT_TABLES = (StockItem._meta.db_table, Transaction._meta.db_table, DailyRollup._meta.db_table)
+ROLLUP_TYPES = ('SALE', 'BUY', 'RENT', 'OTHER')
+
+@transaction.atomic
+def seed_plan_data(tenants=20, items=2000, txs=2000, days=365):
+    """批量造多租户种子数据，返回 (全部租户, 首个租户的首个商品, 其资金账户)；用完由 drop_plan_data 清掉"""
+    now = timezone.now(); today = timezone.localdate(); tag = time.time_ns() % 10**9
+    ts = Tenant.objects.bulk_create([Tenant(name=f'plan{i}', owner_name='plan', phone=f'p{tag}{i:04d}') for i in range(tenants)])
+    products, accounts, contacts, stock, flows = [], [], [], [], []
+    for t in ts:
+        products += [Product(tenant=t, name=f'商品{j}', category='PH') for j in range(20)]
+        accounts.append(CapitalAccount(tenant=t, name='现金账户')); contacts.append(Contact(tenant=t, name='散客'))
+    Product.objects.bulk_create(products, batch_size=1000)
+    CapitalAccount.objects.bulk_create(accounts); Contact.objects.bulk_create(contacts)
+    # 各租户按时间交错写入 (贴近真实分布：同一租户的行散落在整张表里)；大部分已售，小部分在库/待入库
+    for j in range(max(items, txs)):
+        for ti, t in enumerate(ts):
+            tp = products[ti * 20:(ti + 1) * 20]
+            if j < items:
+                stock.append(StockItem(tenant=t, product=tp[j % 20], sn=f'{tag}-{ti}-{j}', real_cost=Decimal('100'),
+                                       status='IN_STOCK' if j % 10 == 0 else ('PENDING' if j % 25 == 1 else 'SOLD')))
+            if j < txs:
+                flows.append(Transaction(tenant=t, contact=contacts[ti], product=tp[j % 20], account=accounts[ti], amount=Decimal('10'), type=ROLLUP_TYPES[j % 4]))
+    rollups = [DailyRollup(tenant=t, day=today - timedelta(days=d), type=k, amount=Decimal('10'), count=1) for d in range(days) for t in ts for k in ROLLUP_TYPES]
+    StockItem.objects.bulk_create(stock, batch_size=2000)
+    Transaction.objects.bulk_create(flows, batch_size=2000)
+    DailyRollup.objects.bulk_create(rollups, batch_size=2000)
+    # in_time / created_at 为 auto_now_add，铺开到近一年便于区间过滤
+    # UPDATE 会整行重写：强制顺序扫描，按物理顺序重写才能保持交错；走 tenant_id 索引会把同租户的行重新聚到一起
+    with connection.cursor() as cur:
+        cur.execute('SET LOCAL enable_indexscan = off'); cur.execute('SET LOCAL enable_bitmapscan = off')
+        for table, col in ((StockItem._meta.db_table, 'in_time'), (Transaction._meta.db_table, 'created_at')):
+            cur.execute(f"UPDATE {table} SET {col} = %s - (id %% %s) * interval '1 day' WHERE tenant_id = ANY(%s)", [now, days, [t.id for t in ts]])
+    return ts, products[0], accounts[0]
+
+def vacuum_plan_tables():
+    """VACUUM ANALYZE 种子涉及的表 (须在事务外执行)：线上表有 autovacuum 维护可见性映射，
+    不清理的话覆盖索引的 Index Only Scan 要逐行回表，规划器会改走单列 tenant_id 索引，检查结果失真"""
+    with connection.cursor() as cur:
+        for table in (Tenant._meta.db_table, Product._meta.db_table, *HOT_TABLES): cur.execute(f'VACUUM ANALYZE {table}')
+
+@transaction.atomic
+def drop_plan_data(tenants):
+    """按外键顺序直接 DELETE 种子数据 (不走 ORM 级联与信号)"""
+    ids = [t.id for t in tenants]
+    with connection.cursor() as cur:
+        for model in (StockItem, Transaction, DailyRollup, Contact, CapitalAccount, Product):
+            cur.execute(f'DELETE FROM {model._meta.db_table} WHERE tenant_id = ANY(%s)', [ids])
+        cur.execute(f'DELETE FROM {Tenant._meta.db_table} WHERE id = ANY(%s)', [ids])
+
+def unique_index_name(model, columns):
+    """unique_together 的索引名由 Django 按哈希生成，按列从库里反查"""
+    with connection.cursor() as cur:
+        constraints = connection.introspection.get_constraints(cur, model._meta.db_table)
+    return next(name for name, c in constraints.items() if c['unique'] and c['columns'] == list(columns))
+
+def hot_queries(tenant, product, account):
+    """[(名称, 查询, 预期索引)]"""
+    now = timezone.now(); today = timezone.localdate()
+    items = StockItem.objects.filter(tenant=tenant)
+    rollups = DailyRollup.objects.filter(tenant=tenant)
+    return [
+        ('先进先出出库', items.filter(product=product, status='IN_STOCK').order_by('id').values('id', 'sn')[:5], 'stock_fifo_instock_idx'),
+        ('库存货值', items.filter(status='IN_STOCK').values('tenant_id').annotate(s=Sum('real_cost')), 'stock_tenant_status_idx'),
+        ('待入库列表', items.filter(status='PENDING').values('id', 'sn'), 'stock_tenant_status_idx'),
+        ('今日入库', items.filter(in_time__gte=now - timedelta(days=1)).values('tenant_id').annotate(n=Count('id')), 'stock_tenant_intime_idx'),
+        # 看板趋势读日汇总 (analytics.rollup_trend)
+        ('看板趋势', rollups.filter(day__gte=today - timedelta(days=TREND_DAYS - 1), day__lte=today, type__in=INCOME_TYPES).values('day')
+            .annotate(amount=Sum('amount'), sale_count=Sum('count', filter=Q(type='SALE'))).order_by(),
+         unique_index_name(DailyRollup, ('tenant_id', 'day', 'type', 'staff_id', 'category'))),
+        ('IMEI 尾号搜索', items.filter(sn__ilike=f'%{product.id % 10}-1990'), 'stock_sn_trgm_idx'),
+        ('账户对账单', Transaction.objects.filter(account=account, created_at__gte=now - timedelta(days=30)).order_by('-created_at')[:50], 'tx_account_time_idx'),
+    ]
+
+def explain(qs):
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cur:
+        cur.execute('EXPLAIN ' + sql, params)
+        return '\n'.join(r[0] for r in cur.fetchall())
+
+def plan_problem(plan, index):
+    """计划合格返回 None，否则返回原因：热点表顺序扫描，或没用上预期索引"""
+    if any(f'Seq Scan on {t}' in plan for t in HOT_TABLES): return '顺序扫描'
+    if index not in plan: return f'未用 {index}'
+    return None
@@ -0,0 +1,51 @@
+import re
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import CharField, Lookup, Q, F, Case, When, Value, FloatField, BigIntegerField
+from django.db.models.functions import Greatest, Cast, Round
+from rest_framework import filters
+
+
+class ILike(Lookup):
+    """PostgreSQL ILIKE：不像 icontains 那样套 UPPER()，可以直接命中 gin_trgm_ops 索引 (值自带 % 通配符)"""
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
+
+CharField.register_lookup(ILike)
+
+def like_escape(term):
+    return re.sub(r'([\\%_])', r'\\\1', term)
+
+
+class TrigramSearchFilter(filters.SearchFilter):
+    """?search= 搜索后端。
+    PostgreSQL：各字段 ILIKE '%词%' (pg_trgm GIN 索引)，按三元组相似度排序；
+    视图的 search_suffix_fields (SN/IMEI) 额外支持尾号匹配，精确命中 > 尾号命中 > 其他；
+    结果照常游标翻页：相关度 (3 位小数) 与 id 拼成唯一整数键 search_cursor 作为游标，同分按 -id，不靠 OFFSET 处理并列。
+    依赖 PostgreSQL 的 pg_trgm 扩展 (迁移 0005 创建扩展与 GIN 索引，数据库需装有 contrib 包)；
+    其他数据库不建这些索引，退回 DRF 默认的 icontains。"""
+
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, 'search_fields', None)
+        term = request.query_params.get(self.search_param, '').strip()
+        if not fields or not term or connection.vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        pattern = like_escape(term)
+        suffix_fields = getattr(view, 'search_suffix_fields', [])
+        cond = Q()
+        for f in fields: cond |= Q(**{f'{f}__ilike': f'%{pattern}%'})
+
+        sims = [TrigramSimilarity(f, term) for f in fields]
+        rank = Greatest(*sims) if len(sims) > 1 else sims[0]
+        for f in suffix_fields:
+            rank = rank + Case(
+                When(**{f'{f}__iexact': term}, then=Value(2.0)),
+                When(**{f'{f}__ilike': f'%{pattern}'}, then=Value(1.0)),
+                default=Value(0.0), output_field=FloatField())
+        key = Cast(Round(rank * 1000), BigIntegerField()) * 10**12 + F('id')
+        return queryset.filter(cond).annotate(search_rank=rank, search_cursor=key).order_by('-search_cursor')
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Product, Contact, RentalContract, Transaction, CapitalAccount, Tenant, StockItem, CustomUser
+from .models import Product, Contact, RentalContract, Transaction, CapitalAccount, Tenant, StockItem, CustomUser, SerialNumberFactory
 from django.utils import timezone
+from django.core.files.storage import default_storage
+from core.images import thumb_name
 
 # 🟢 资金账户序列化
 class CapitalAccountSerializer(serializers.ModelSerializer):
@@ -29,20 +31,40 @@ class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     class Meta: model = Tenant; fields = ['name', 'owner_name', 'phone', 'password']
 
+# 🟢 商品流转记录 (列表页只带最近 N 条，完整记录走 /api/products/{id}/flow/)
+FLOW_HISTORY_LIMIT = 5
+
+def flow_queryset():
+    return Transaction.objects.select_related('operator').order_by('-created_at', '-id')
+
+def flow_entry(t):
+    return {'date': t.created_at.strftime('%Y-%m-%d'), 'type': t.get_type_display(), 'operator': t.operator.initials if t.operator else '系统', 'desc': t.remark or '-'}
+
 class ProductSerializer(serializers.ModelSerializer):
     color_tag = serializers.SerializerMethodField()
     flow_history = serializers.SerializerMethodField()
+    image_thumb = serializers.SerializerMethodField()
     sn = serializers.CharField(write_only=True, required=False, allow_blank=True)
     class Meta: 
         model = Product
         fields = '__all__'
-        read_only_fields = ['id', 'tenant', 'created_at']
+        # 图片走 core.images 处理流程 (视图里单独接收)，不经序列化器直接落盘
+        read_only_fields = ['id', 'tenant', 'created_at', 'image']
     
     def get_color_tag(self, obj): return 'green' 
 
+    # 🟢 列表缩略图 (几 KB)；旧图未处理过时为 None，前端回退用原图
+    def get_image_thumb(self, obj):
+        name = thumb_name(obj.image.name if obj.image else None)
+        if not name: return None
+        url = default_storage.url(name); request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
     def get_flow_history(self, obj):
-        txs = Transaction.objects.filter(product=obj).order_by('-created_at')
-        return [{'date': t.created_at.strftime('%Y-%m-%d'), 'type': t.get_type_display(), 'operator': t.operator.initials if t.operator else '系统', 'desc': t.remark or '-'} for t in txs]
+        # 列表页：直接使用视图整页批量预取的最近 N 条 (recent_flow)，不再逐个商品查库
+        txs = getattr(obj, 'recent_flow', None)
+        if txs is None: txs = flow_queryset().filter(product=obj)
+        return [flow_entry(t) for t in txs]
 
 class ContactSerializer(serializers.ModelSerializer):
     class Meta: 
@@ -58,7 +80,7 @@ class RentalContractSerializer(serializers.ModelSerializer):
     class Meta: 
         model = RentalContract
         fields = '__all__'
-        read_only_fields = ['id', 'tenant']
+        read_only_fields = ['id', 'tenant', 'billed_periods', 'due_date', 'next_bill_date']
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta: 
@@ -71,4 +93,13 @@ class StockItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     class Meta:
         model = StockItem
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        # 归属/序列号/状态只能经入库、转正、销售等接口变更 (查重、记账、跨租户校验都在那里)
+        read_only_fields = ['id', 'tenant', 'product', 'sn', 'status', 'supplier']
+
+# 🟢 序列号工厂
+class SerialNumberFactorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SerialNumberFactory
+        fields = '__all__'
+        read_only_fields = ['id', 'tenant', 'create_time']
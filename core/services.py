@@ -0,0 +1,269 @@
+import re
+from decimal import Decimal
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Q, F, Case, When, Value
+from django.utils import timezone
+
+from core.models import StockItem, CapitalAccount, Contact, Product, TenantSequence, RentalContract, Transaction, add_months, rental_schedule
+from core.analytics import invalidate_tenant_cache, bump_rollup
+
+# ==========================================
+# 📥 1. 批量入库引擎
+# ==========================================
+INBOUND_BATCH_SIZE = 5000   # 每条 INSERT 语句写入的行数
+SN_CHECK_CHUNK = 5000       # 撞号检测时每次 IN 查询的 SN 数
+MAX_INBOUND_QTY = 50000     # 单次入库上限 (防止误填数量)
+SN_MAX_LENGTH = StockItem._meta.get_field('sn').max_length
+
+class InboundError(Exception):
+    """入库失败，conflicts 为逐行冲突明细 [{'row', 'sn', 'reason'}]"""
+    def __init__(self, msg, conflicts=None):
+        super().__init__(msg)
+        self.conflicts = conflicts or []
+
+def parse_sn_list(raw):
+    """解析粘贴/扫码枪录入的序列号 (支持 list、换行、逗号、分号、空格分隔)"""
+    if not raw: return []
+    if isinstance(raw, (list, tuple)): raw = '\n'.join(str(x) for x in raw)
+    return [s for s in re.split(r'[\s,，;；]+', str(raw)) if s]
+
+def build_inbound_sns(quantity, need_sn=False, base_sn=None, sn_list=None):
+    """一次性生成全部 SN：扫码列表 > WAIT 占位 > 指定SN流水 > AUTO 流水 (整批共用一个时间戳)"""
+    if sn_list: return list(sn_list)
+    stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    if need_sn: return [f"WAIT-{stamp}-{i+1}" for i in range(quantity)]
+    if base_sn: return [base_sn] if quantity == 1 else [f"{base_sn}-{i+1}" for i in range(quantity)]
+    return [f"AUTO-{stamp}-{i+1}" for i in range(quantity)]
+
+def find_sn_conflicts(tenant, sns):
+    """逐行报告 (tenant, sn) 冲突：超长 + 批内重复 + 库内已存在 (分块 IN 查询，不逐条查)"""
+    conflicts = []; first_row = {}
+    for row, sn in enumerate(sns, 1):
+        if len(sn) > SN_MAX_LENGTH: conflicts.append({'row': row, 'sn': sn, 'reason': f'序列号超过 {SN_MAX_LENGTH} 位'})  # 否则 INSERT 报 DataError
+        elif sn in first_row: conflicts.append({'row': row, 'sn': sn, 'reason': f'与第 {first_row[sn]} 行重复'})
+        else: first_row[sn] = row
+    uniq = list(first_row)
+    for i in range(0, len(uniq), SN_CHECK_CHUNK):
+        taken = StockItem.objects.filter(tenant=tenant, sn__in=uniq[i:i + SN_CHECK_CHUNK]).values_list('sn', flat=True)
+        conflicts.extend({'row': first_row[sn], 'sn': sn, 'reason': '序列号已存在'} for sn in taken)
+    conflicts.sort(key=lambda c: c['row'])
+    return conflicts
+
+def bulk_inbound(tenant, product, sns, real_cost, status='IN_STOCK', supplier_id=None, note=''):
+    """批量写入库存实物：先整体查重，再按 INBOUND_BATCH_SIZE 分批 INSERT，返回写入行数"""
+    conflicts = find_sn_conflicts(tenant, sns)
+    if conflicts: raise InboundError(f'{len(conflicts)} 个序列号冲突', conflicts)
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # SN 以数组参数传入，INSERT ... SELECT unnest() 一条语句写完一批，省掉逐个模型对象的构造与取值
+                table = StockItem._meta.db_table; now = timezone.now()
+                with connection.cursor() as cur:
+                    for i in range(0, len(sns), INBOUND_BATCH_SIZE):
+                        cur.execute(
+                            f"INSERT INTO {table} (tenant_id, product_id, sn, real_cost, status, supplier_id, note, in_time)"
+                            f" SELECT %s, %s, s, %s, %s, %s, %s, %s FROM unnest(%s::varchar[]) AS s",
+                            [tenant.id, product.id, real_cost, status, supplier_id, note, now, sns[i:i + INBOUND_BATCH_SIZE]])
+            else:
+                StockItem.objects.bulk_create([StockItem(tenant=tenant, product=product, sn=sn, real_cost=real_cost, status=status, supplier_id=supplier_id, note=note) for sn in sns], batch_size=INBOUND_BATCH_SIZE)
+    except IntegrityError:
+        # 查重之后被并发入库抢先写入了同号：重新定位冲突行
+        raise InboundError('序列号冲突 (并发入库)', find_sn_conflicts(tenant, sns))
+    invalidate_tenant_cache(tenant.id)  # 批量写入不发 post_save
+    return len(sns)
+
+# ==========================================
+# 📤 2. 先进先出出库引擎
+# ==========================================
+class StockShortage(Exception):
+    """可认领库存不足，available 为本次实际可认领台数"""
+    def __init__(self, available, wanted):
+        super().__init__(f'库存不足！当前仅剩 {available} 台，无法卖出 {wanted} 台')
+        self.available = available; self.wanted = wanted
+
+def claim_fifo_stock(product, quantity, to_status='SOLD', with_cost=False):
+    """认领该商品最早入库的 N 台 IN_STOCK 并改为 to_status，返回按入库顺序排列的 SN 列表；
+    with_cost=True 时返回 (SN 列表, 这 N 台真实入库价合计)，供销售流水记成本。
+    行锁用 SKIP LOCKED：别的收银台正在卖的行直接跳过，不排队等待。
+    必须在 transaction.atomic() 内调用；不足 N 台时抛 StockShortage，由外层事务整单回滚。"""
+    if connection.vendor == 'postgresql':
+        # 一条语句完成 认领 + 改状态 + 取回 SN
+        # 认领放在 MATERIALIZED CTE 里：写成 WHERE id IN (子查询 LIMIT) 时规划器可能重复执行子查询，改出超过 N 行
+        table = StockItem._meta.db_table
+        with connection.cursor() as cur:
+            cur.execute(
+                f"WITH picked AS MATERIALIZED ("
+                f" SELECT id FROM {table} WHERE tenant_id = %s AND product_id = %s AND status = 'IN_STOCK'"
+                f" ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED"
+                f") UPDATE {table} AS s SET status = %s FROM picked WHERE s.id = picked.id RETURNING s.id, s.sn, s.real_cost",
+                [product.tenant_id, product.id, quantity, to_status])
+            rows = cur.fetchall()
+    else:
+        # 其他数据库：加锁查询 + 一条集合 UPDATE
+        qs = StockItem.objects.select_for_update(skip_locked=True).filter(tenant_id=product.tenant_id, product=product, status='IN_STOCK').order_by('id')
+        rows = list(qs.values_list('id', 'sn', 'real_cost')[:quantity])
+        StockItem.objects.filter(id__in=[r[0] for r in rows]).update(status=to_status)
+    if len(rows) < quantity: raise StockShortage(len(rows), quantity)
+    invalidate_tenant_cache(product.tenant_id)  # update() 不发 post_save
+    sns = [sn for _, sn, _ in sorted(rows)]
+    return (sns, sum((c or Decimal('0') for _, _, c in rows), Decimal('0'))) if with_cost else sns
+
+# ==========================================
+# ✅ 3. 扫码转正 (PENDING -> IN_STOCK)
+# ==========================================
+def confirm_pending(tenant, pairs=None, product=None, sns=None):
+    """批量转正，必须在 transaction.atomic() 内调用。两种用法：
+    pairs=[(库存id 或 WAIT 占位SN, 真实SN)]；或 product + sns：扫到的 SN 依次分给该商品最早的 PENDING。
+    真实 SN 一次查询做库内查重，合法行一次 bulk_update 落库，非法行跳过；返回逐行结果"""
+    if product is not None:
+        pending = list(StockItem.objects.select_for_update(skip_locked=True).filter(tenant=tenant, product=product, status='PENDING').order_by('id')[:len(sns)])
+        rows = [{'ref': None, 'item': pending[i] if i < len(pending) else None, 'sn': sn} for i, sn in enumerate(sns)]
+    else:
+        refs = [str(ref or '').strip() for ref, _ in pairs]
+        found = StockItem.objects.select_for_update().filter(tenant=tenant, status='PENDING').filter(
+            Q(id__in=[int(r) for r in refs if r.isdigit()]) | Q(sn__in=[r for r in refs if r and not r.isdigit()]))
+        by_id = {s.id: s for s in found}; by_sn = {s.sn: s for s in by_id.values()}
+        rows = [{'ref': r, 'item': by_id.get(int(r)) if r.isdigit() else by_sn.get(r), 'sn': str(sn or '').strip()} for r, (_, sn) in zip(refs, pairs)]
+
+    taken = set()
+    wanted = [r['sn'] for r in rows if r['sn']]
+    for i in range(0, len(wanted), SN_CHECK_CHUNK):
+        taken.update(StockItem.objects.filter(tenant=tenant, sn__in=wanted[i:i + SN_CHECK_CHUNK]).values_list('sn', flat=True))
+
+    results = []; to_save = []; seen_sn = {}; seen_item = set()
+    for n, r in enumerate(rows, 1):
+        item, sn = r['item'], r['sn']
+        if not sn: msg = '真实序列号为空'
+        elif len(sn) > SN_MAX_LENGTH: msg = f'序列号超过 {SN_MAX_LENGTH} 位'
+        elif item is None: msg = '待入库记录不存在或已转正' if r['ref'] is not None else '该商品已没有待入库的库存'
+        elif item.id in seen_item: msg = '同一台设备重复录入'
+        elif sn in seen_sn: msg = f'与第 {seen_sn[sn]} 行序列号重复'
+        elif sn in taken: msg = '序列号已存在'
+        else: msg = None
+        if sn and sn not in seen_sn: seen_sn[sn] = n
+        if msg:
+            results.append({'row': n, 'id': item.id if item else None, 'sn': sn, 'ok': False, 'msg': msg}); continue
+        seen_item.add(item.id)
+        results.append({'row': n, 'id': item.id, 'sn': sn, 'ok': True, 'msg': '入库成功', 'placeholder': item.sn})
+        item.sn = sn; item.status = 'IN_STOCK'; to_save.append(item)
+
+    if to_save:
+        try:
+            with transaction.atomic():
+                StockItem.objects.bulk_update(to_save, ['sn', 'status'], batch_size=INBOUND_BATCH_SIZE)
+        except IntegrityError:
+            raise InboundError('序列号冲突 (并发录入)，请重新提交')
+        invalidate_tenant_cache(tenant.id)  # bulk_update 不发 post_save
+    return results
+
+# ==========================================
+# 💰 4. 记账引擎 (账户余额 / 往来余额)
+# ==========================================
+class BalanceError(Exception):
+    pass
+
+BULK_POST_MIN = 20     # 单次过账行数超过此值走批量 UPDATE (月结计费等)
+BULK_POST_CHUNK = 1000
+
+def post_balances(tenant_id, accounts=None, contacts=None):
+    """按增量过账：accounts={账户id: 增减额}，contacts={往来单位id: 增减额}，必须在 transaction.atomic() 内调用。
+    每行一条 UPDATE SET x = x + delta (数据库里原子累加，并发不丢更新，只写余额一列)；
+    固定加锁顺序：先账户后往来、各自按 id 升序，多笔并发收付款不会互相死锁。
+    行数多时按 id 升序先 SELECT FOR UPDATE 锁定，再一条 CASE UPDATE 写一批 (加锁顺序不变)。
+    目标行不存在 (或不属于该租户) 时抛 BalanceError，由外层事务整单回滚"""
+    for model, field, deltas in ((CapitalAccount, 'current_balance', accounts), (Contact, 'balance', contacts)):
+        plan = sorted((pk, delta) for pk, delta in (deltas or {}).items() if delta)
+        if len(plan) > BULK_POST_MIN:
+            for i in range(0, len(plan), BULK_POST_CHUNK):
+                part = dict(plan[i:i + BULK_POST_CHUNK])
+                locked = set(model.objects.select_for_update().filter(tenant_id=tenant_id, id__in=list(part)).order_by('id').values_list('id', flat=True))
+                if len(locked) != len(part): raise BalanceError(f'{model._meta.verbose_name} {min(set(part) - locked)} 不存在')
+                model.objects.filter(id__in=list(part)).update(**{field: F(field) + Case(*(When(id=pk, then=Value(d)) for pk, d in part.items()), output_field=model._meta.get_field(field))})
+            continue
+        for pk, delta in plan:
+            if not model.objects.filter(id=pk, tenant_id=tenant_id).update(**{field: F(field) + delta}):
+                raise BalanceError(f'{model._meta.verbose_name} {pk} 不存在')
+    invalidate_tenant_cache(tenant_id)  # update() 不发 post_save
+
+# ==========================================
+# 🔢 5. 发号器 (商品编码)
+# ==========================================
+def allocate_seq(tenant_id, name, count=1, seed=None):
+    """从租户序列 name 原子领取 count 个连续号，返回第一个号 (本批为 first ~ first+count-1)。
+    热路径一条 UPDATE (行锁到事务结束，并发领号排队、不重号)，与表里有多少商品无关；
+    序列行不存在时先建，初值取 seed() (用于接上历史编号)"""
+    table = TenantSequence._meta.db_table
+    for _ in range(2):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cur:
+                cur.execute(f"UPDATE {table} SET value = value + %s WHERE tenant_id = %s AND name = %s RETURNING value", [count, tenant_id, name])
+                row = cur.fetchone()
+            if row: return row[0] - count + 1
+        else:
+            seq = TenantSequence.objects.select_for_update().filter(tenant_id=tenant_id, name=name).first()
+            if seq:
+                seq.value += count; seq.save(update_fields=['value'])
+                return seq.value - count + 1
+        # 首次使用：建序列行 (并发首建由唯一约束兜底，get_or_create 会改为读取)
+        TenantSequence.objects.get_or_create(tenant_id=tenant_id, name=name, defaults={'value': seed or 0})
+    raise RuntimeError(f'序列 {name} 领号失败')
+
+def next_zencodes(tenant, initials, category, count=1):
+    """商品编码 = 年(2位)月日 + 经手人缩写 + 分类 + 分类内流水号；批量导入时一次领 count 个号"""
+    dt = timezone.now(); prefix = f"{str(dt.year)[-2:]}{dt.month}{dt.day:02d}{initials}{category}"
+    # 序列初值接上旧规则 (该分类已有商品数)，老租户编号不回退
+    first = allocate_seq(tenant.id, f'zencode:{category}', count, seed=lambda: Product.objects.filter(tenant=tenant, category=category).count())
+    return [f"{prefix}{first + i}" for i in range(count)]
+
+# ==========================================
+# 🧾 6. 租赁月结计费
+# ==========================================
+BILLING_CHUNK = 2000  # 每个事务处理的合同数
+BILLING_REQUEST_CHUNKS = 5  # 接口单次最多处理的批数，其余留给下一次调用或 bill_rentals 命令
+
+def periods_due(start, duration, as_of):
+    """截至 as_of 应出账的期数：按月预收，每期起租对应日当天出账，不超过租期"""
+    if start > as_of: return 0
+    n = (as_of.year - start.year) * 12 + as_of.month - start.month
+    if add_months(start, n) > as_of: n -= 1
+    return min(duration, n + 1)
+
+def bill_rentals(tenant_id, as_of=None, dry_run=False, max_chunks=None):
+    """租户内全部进行中合同补齐到 as_of 应出未出的账期：每期一笔 RENT 流水 (记应收，不进资金账户)，客户往来余额按合计增加。
+    按 BILLING_CHUNK 分批，每批一个事务：下次出账日索引范围取合同 (SKIP LOCKED) -> 批量写流水 -> 批量回写已出账期数/下次出账日 -> 过账 -> 日汇总。
+    幂等：已出账期数与流水同事务提交，重复运行或多进程同时跑都不会重复出账。
+    max_chunks 限制本次处理的批数 (接口用)，还有没处理到的合同时 more=True。返回 {'contracts', 'periods', 'amount', 'more'}"""
+    as_of = as_of or timezone.localdate()
+    pending = RentalContract.objects.filter(tenant_id=tenant_id, is_active=True, next_bill_date__lte=as_of)
+    summary = {'contracts': 0, 'periods': 0, 'amount': Decimal('0'), 'more': False}
+    last_id = 0; chunks = 0
+    while True:
+        if max_chunks and chunks >= max_chunks:
+            summary['more'] = pending.filter(id__gt=last_id).exists(); break
+        chunks += 1
+        with transaction.atomic():
+            chunk = list(pending.filter(id__gt=last_id).order_by('id').select_for_update(skip_locked=True, of=('self',)).values(
+                'id', 'contact_id', 'product_id', 'product__category', 'start_date', 'duration', 'billed_periods', 'rent_price')[:BILLING_CHUNK])
+            if not chunk: break
+            last_id = chunk[-1]['id']
+            txs = []; billed = []; contacts = {}; by_cat = {}
+            for c in chunk:
+                due = periods_due(c['start_date'], c['duration'], as_of)
+                if due <= c['billed_periods']: continue
+                n = due - c['billed_periods']; amount = c['rent_price'] * n
+                txs += [Transaction(tenant_id=tenant_id, contact_id=c['contact_id'], product_id=c['product_id'], amount=c['rent_price'], type='RENT',
+                                    remark=f"租金: 合同#{c['id']} 第{k + 1}/{c['duration']}期 ({add_months(c['start_date'], k):%Y-%m})")
+                        for k in range(c['billed_periods'], due)]
+                billed.append(RentalContract(id=c['id'], billed_periods=due, next_bill_date=rental_schedule(c['start_date'], c['duration'], due)[1]))
+                contacts[c['contact_id']] = contacts.get(c['contact_id'], 0) + amount
+                cat = c['product__category'] or ''; a, cnt = by_cat.get(cat, (0, 0)); by_cat[cat] = (a + amount, cnt + n)
+                summary['contracts'] += 1; summary['periods'] += n; summary['amount'] += amount
+            if dry_run or not txs: continue
+            Transaction.objects.bulk_create(txs, batch_size=INBOUND_BATCH_SIZE)
+            RentalContract.objects.bulk_update(billed, ['billed_periods', 'next_bill_date'], batch_size=BILLING_CHUNK)
+            post_balances(tenant_id, contacts=contacts)
+            # bulk_create 不发信号：日汇总按 (分类) 合并后直接累加，经手人记系统 (0)
+            day = timezone.localdate(txs[0].created_at)
+            for cat, (amount, cnt) in by_cat.items():
+                bump_rollup({'tenant_id': tenant_id, 'day': day, 'type': 'RENT', 'staff_id': 0, 'category': cat}, amount, Decimal('0'), cnt)
+    return summary
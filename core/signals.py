@@ -0,0 +1,48 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Tenant, CustomUser, Transaction, StockItem, Contact, CapitalAccount, RentalContract
+from core.analytics import invalidate_tenant_cache, apply_to_rollup, invalidate_forecast
+from core.tenancy import invalidate_tenant
+from core.auth import invalidate_user
+
+# 🟢 看板缓存失效：单行 save/delete 走信号；bulk_create / update() 不发信号，由 core.services 里显式调用
+@receiver([post_save, post_delete], sender=Transaction)
+@receiver([post_save, post_delete], sender=StockItem)
+@receiver([post_save, post_delete], sender=Contact)
+@receiver([post_save, post_delete], sender=CapitalAccount)
+def drop_dashboard_cache(sender, instance, **kwargs):
+    invalidate_tenant_cache(instance.tenant_id)
+
+# 🟢 租赁预测缓存失效 (合同新增/修改/退租/删除)
+@receiver([post_save, post_delete], sender=RentalContract)
+def drop_forecast_cache(sender, instance, **kwargs):
+    invalidate_forecast(instance.tenant_id)
+
+# 🟢 租户缓存失效 (审核/停用/续费/改名后立即生效)
+@receiver([post_save, post_delete], sender=Tenant)
+def drop_tenant_cache(sender, instance, **kwargs):
+    invalidate_tenant(instance.id)
+
+# 🟢 登录用户缓存失效 (改密码/停用/改角色后立即生效)
+@receiver([post_save, post_delete], sender=CustomUser)
+def drop_user_cache(sender, instance, **kwargs):
+    invalidate_user(instance.id)
+
+# 🟢 经营日汇总：流水新增/修改/删除时增量维护 DailyRollup
+@receiver(pre_save, sender=Transaction)
+def rollup_stash_old(sender, instance, raw=False, **kwargs):
+    # 修改已有流水：先记下旧值，保存后从汇总里扣掉
+    instance._rollup_old = Transaction.objects.filter(pk=instance.pk).first() if instance.pk and not raw else None
+
+@receiver(post_save, sender=Transaction)
+def rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw: return
+    old = getattr(instance, '_rollup_old', None)
+    if old: apply_to_rollup(old, -1)
+    apply_to_rollup(instance, 1)
+
+@receiver(post_delete, sender=Transaction)
+def rollup_on_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Tenant): return  # 整个租户删除，汇总表随之级联删除
+    apply_to_rollup(instance, -1)
@@ -0,0 +1,48 @@
+import csv
+import json
+import tempfile
+from django.http import StreamingHttpResponse, FileResponse
+from rest_framework.utils import encoders
+
+# ==========================================
+# 🌊 流式输出 (大列表边查边写，内存占用与行数无关)
+# ==========================================
+def _dumps(obj):
+    # 与 DRF JSONRenderer 同一编码器与格式 (Decimal 转数字、日期同样格式化、紧凑分隔符、中文不转义)：流式与分页返回的字段类型一致
+    return json.dumps(obj, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+def stream_json_list(rows, head=None, key='list'):
+    """输出 {**head, key: [rows...]}；rows 应为 queryset.iterator() 之类的惰性迭代器"""
+    def gen():
+        prefix = _dumps(head or {})[:-1]
+        yield f'{prefix}{"," if head else ""}"{key}":['
+        for i, row in enumerate(rows):
+            yield (',' if i else '') + _dumps(row)
+        yield ']}'
+    return StreamingHttpResponse(gen(), content_type='application/json')
+
+
+class _Echo:
+    """csv.writer 的伪文件：writerow 直接返回该行文本"""
+    def write(self, value): return value
+
+def stream_csv(header, rows, filename):
+    """流式 CSV 下载 (带 BOM，Excel 直接打开不乱码)；rows 为惰性迭代的元组/列表"""
+    writer = csv.writer(_Echo())
+    def gen():
+        yield '\ufeff' + writer.writerow(header)
+        for row in rows: yield writer.writerow(row)
+    resp = StreamingHttpResponse(gen(), content_type='text/csv; charset=utf-8')
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
+
+def stream_xlsx(header, rows, filename):
+    """XLSX 下载：openpyxl 只写模式逐行落到临时文件 (不在内存里攒整张表)，写完再分块回传"""
+    from openpyxl import Workbook  # 可选依赖，未安装时由调用方提示改用 CSV
+    wb = Workbook(write_only=True); ws = wb.create_sheet()
+    ws.append(header)
+    for row in rows: ws.append(list(row))
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp); tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=filename,
+                        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
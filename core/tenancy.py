@@ -0,0 +1,58 @@
+from django.contrib.auth import logout
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from core.models import Tenant
+
+# ==========================================
+# 🏢 租户上下文 (每个请求只解析一次租户)
+# ==========================================
+TENANT_TTL = 300  # 兜底过期 (秒)，正常由 Tenant 保存/删除主动失效
+OPEN_PATHS = ('/login/', '/register/', '/api/login/', '/api/logout/', '/api/register/', '/api/token/')  # 停用租户仍可访问
+
+def tenant_cache_key(tenant_id): return f"zen:tenant:{tenant_id}"
+
+def get_cached_tenant(tenant_id):
+    """按 id 取租户：先读缓存，未命中再查库回填"""
+    if not tenant_id: return None
+    key = tenant_cache_key(tenant_id)
+    tenant = cache.get(key)
+    if tenant is None:
+        tenant = Tenant.objects.filter(id=tenant_id).first()
+        if tenant: cache.set(key, tenant, TENANT_TTL)
+    return tenant
+
+def invalidate_tenant(tenant_id):
+    transaction.on_commit(lambda: cache.delete(tenant_cache_key(tenant_id)))
+
+def tenant_block_reason(tenant):
+    """租户不可用时返回提示语 (待审核/停用、已到期)，可用返回 None"""
+    if tenant is None: return None
+    if not tenant.is_active: return '账户待审核或已停用'
+    if tenant.expire_date and tenant.expire_date < timezone.localdate(): return f'账户已于 {tenant.expire_date} 到期，请联系续费'
+    return None
+
+def bind_tenant(request, user):
+    """把缓存的租户挂到 request.tenant / user.tenant (后续访问不再查库)，返回停用/到期提示或 None"""
+    tenant = get_cached_tenant(user.tenant_id)
+    user.tenant = request.tenant = tenant
+    return tenant_block_reason(tenant)
+
+class TenantMiddleware:
+    """放在 AuthenticationMiddleware 之后：
+    request.tenant = 当前用户租户 (缓存实例，同时填进 user.tenant，视图/序列化器再访问不查库)；
+    租户停用或到期：API 返回 403，页面退出登录跳回登录页"""
+    def __init__(self, get_response): self.get_response = get_response
+
+    def __call__(self, request):
+        request.tenant = None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.tenant_id:
+            reason = bind_tenant(request, user)
+            if reason and not request.path.startswith(OPEN_PATHS):
+                if request.path.startswith('/api/'): return JsonResponse({'detail': reason}, status=403)
+                logout(request); return redirect('/login/')
+        return self.get_response(request)
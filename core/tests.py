@@ -0,0 +1,248 @@
+import datetime
+import json
+import random
+from unittest import mock, skipUnless
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from core import analytics
+from core.analytics import project_months, _project_months_py, dashboard_cache_key
+from core.models import Tenant, CustomUser, Product, StockItem, Contact, CapitalAccount, RentalContract, Transaction, DailyRollup
+from core.queryplans import seed_plan_data, vacuum_plan_tables, hot_queries, explain, plan_problem
+from core.services import InboundError, SN_MAX_LENGTH, bulk_inbound, BalanceError, BULK_POST_MIN, post_balances, StockShortage, claim_fifo_stock, periods_due, bill_rentals
+
+D = datetime.date
+
+
+class TenantTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='测试', owner_name='t', phone='test-tenant')
+        cls.other = Tenant.objects.create(name='别家', owner_name='o', phone='test-other')
+        cls.user = CustomUser.objects.create_user(username='tester', password='x', tenant=cls.tenant, role='ADMIN')
+        cls.product = Product.objects.create(tenant=cls.tenant, name='测试机', category='PH', cost_price=Decimal('999'))
+
+
+# ==========================================
+# 📥 批量入库
+# ==========================================
+class BulkInboundTests(TenantTestCase):
+    def test_overlong_and_duplicate_sns_reported_per_row(self):
+        StockItem.objects.create(tenant=self.tenant, product=self.product, sn='OLD')
+        sns = ['A1', 'X' * (SN_MAX_LENGTH + 1), 'A1', 'OLD', 'A2']
+        with self.assertRaises(InboundError) as ctx:
+            bulk_inbound(self.tenant, self.product, sns, real_cost=Decimal('10'))
+        self.assertEqual([(c['row'], c['reason']) for c in ctx.exception.conflicts],
+                         [(2, f'序列号超过 {SN_MAX_LENGTH} 位'), (3, '与第 1 行重复'), (4, '序列号已存在')])
+        self.assertEqual(StockItem.objects.count(), 1)
+
+    def test_writes_all_rows(self):
+        self.assertEqual(bulk_inbound(self.tenant, self.product, [f'N{i}' for i in range(50)], real_cost=Decimal('10')), 50)
+        self.assertEqual(StockItem.objects.filter(tenant=self.tenant, status='IN_STOCK').count(), 50)
+
+
+# ==========================================
+# 💰 记账引擎
+# ==========================================
+class PostBalancesTests(TenantTestCase):
+    def test_small_posting_adds_deltas(self):
+        acc = CapitalAccount.objects.create(tenant=self.tenant, name='现金', current_balance=Decimal('100'))
+        c = Contact.objects.create(tenant=self.tenant, name='客户', balance=Decimal('10'))
+        with transaction.atomic():
+            post_balances(self.tenant.id, accounts={acc.id: Decimal('50')}, contacts={c.id: Decimal('-30'), 0: Decimal('0')})  # 0 增量不落库
+        acc.refresh_from_db(); c.refresh_from_db()
+        self.assertEqual(acc.current_balance, Decimal('150'))
+        self.assertEqual(c.balance, Decimal('-20'))
+
+    def test_bulk_posting_matches_per_row(self):
+        people = Contact.objects.bulk_create([Contact(tenant=self.tenant, name=f'客户{i}', balance=Decimal(i)) for i in range(BULK_POST_MIN * 2)])
+        deltas = {p.id: Decimal(i) + Decimal('0.5') for i, p in enumerate(people)}
+        with transaction.atomic():
+            post_balances(self.tenant.id, contacts=deltas)
+        for i, p in enumerate(people):
+            p.refresh_from_db()
+            self.assertEqual(p.balance, Decimal(i) * 2 + Decimal('0.5'))
+
+    def test_foreign_tenant_row_rolls_back(self):
+        mine = Contact.objects.bulk_create([Contact(tenant=self.tenant, name=f'客户{i}') for i in range(BULK_POST_MIN + 1)])
+        theirs = Contact.objects.create(tenant=self.other, name='别家客户')
+        for deltas in ({mine[0].id: Decimal('5'), theirs.id: Decimal('5')}, {**{p.id: Decimal('5') for p in mine}, theirs.id: Decimal('5')}):
+            with self.assertRaises(BalanceError):
+                with transaction.atomic(): post_balances(self.tenant.id, contacts=deltas)
+        self.assertFalse(Contact.objects.exclude(balance=0).exists())
+
+
+# ==========================================
+# 📦 先进先出认领库存
+# ==========================================
+class ClaimFifoStockTests(TenantTestCase):
+    def setUp(self):
+        StockItem.objects.bulk_create([StockItem(tenant=self.tenant, product=self.product, sn=f'SN{i}', real_cost=Decimal(100 + i)) for i in range(5)])
+
+    def test_claims_oldest_units_with_cost(self):
+        with transaction.atomic():
+            sns, cost = claim_fifo_stock(self.product, 3, with_cost=True)
+        self.assertEqual(sns, ['SN0', 'SN1', 'SN2'])
+        self.assertEqual(cost, Decimal('303'))
+        self.assertEqual(list(StockItem.objects.filter(status='SOLD').order_by('id').values_list('sn', flat=True)), sns)
+
+    def test_to_status_and_plain_return(self):
+        with transaction.atomic():
+            self.assertEqual(claim_fifo_stock(self.product, 1, to_status='RENTED'), ['SN0'])
+            self.assertEqual(claim_fifo_stock(self.product, 1), ['SN1'])
+        self.assertEqual(StockItem.objects.get(sn='SN0').status, 'RENTED')
+
+    def test_shortage_claims_nothing(self):
+        with self.assertRaises(StockShortage) as ctx:
+            with transaction.atomic(): claim_fifo_stock(self.product, 6)
+        self.assertEqual((ctx.exception.available, ctx.exception.wanted), (5, 6))
+        self.assertEqual(StockItem.objects.filter(status='IN_STOCK').count(), 5)
+
+
+# ==========================================
+# 🧾 租赁月结
+# ==========================================
+class RentalBillingTests(TenantTestCase):
+    def test_periods_due(self):
+        cases = [
+            (D(2026, 3, 10), 6, D(2026, 3, 9), 0),    # 未起租
+            (D(2026, 3, 10), 6, D(2026, 3, 10), 1),   # 起租当天出第 1 期
+            (D(2026, 3, 10), 6, D(2026, 4, 9), 1),
+            (D(2026, 3, 10), 6, D(2026, 4, 10), 2),
+            (D(2026, 1, 31), 6, D(2026, 2, 28), 2),   # 月末起租：短月按月末出账
+            (D(2026, 1, 31), 6, D(2026, 3, 30), 2),
+            (D(2026, 1, 31), 6, D(2026, 3, 31), 3),
+            (D(2025, 1, 15), 3, D(2026, 1, 1), 3),    # 不超过租期
+        ]
+        for start, duration, as_of, want in cases:
+            with self.subTest(start=start, as_of=as_of):
+                self.assertEqual(periods_due(start, duration, as_of), want)
+
+    def test_bill_rentals_is_idempotent(self):
+        contact = Contact.objects.create(tenant=self.tenant, name='租客')
+        contracts = [RentalContract.objects.create(tenant=self.tenant, contact=contact, product=self.product, operator=self.user, start_date=start,
+                                                   duration=duration, rent_price=Decimal('100'), is_active=active)
+                     for start, duration, active in ((D(2026, 1, 31), 12, True), (D(2026, 3, 10), 2, True), (D(2026, 1, 1), 12, False))]
+        as_of = D(2026, 5, 15)
+
+        self.assertEqual(bill_rentals(self.tenant.id, as_of, dry_run=True), {'contracts': 2, 'periods': 6, 'amount': Decimal('600'), 'more': False})
+        self.assertFalse(Transaction.objects.filter(type='RENT').exists())
+
+        first = bill_rentals(self.tenant.id, as_of)
+        self.assertEqual(first, {'contracts': 2, 'periods': 6, 'amount': Decimal('600'), 'more': False})  # 4 期 + 2 期 (租期封顶)
+        self.assertEqual(bill_rentals(self.tenant.id, as_of), {'contracts': 0, 'periods': 0, 'amount': Decimal('0'), 'more': False})
+
+        self.assertEqual(Transaction.objects.filter(tenant=self.tenant, type='RENT').count(), 6)
+        contact.refresh_from_db(); self.assertEqual(contact.balance, Decimal('600'))
+        long, short, stopped = [RentalContract.objects.get(id=c.id) for c in contracts]
+        self.assertEqual((long.billed_periods, long.next_bill_date), (4, D(2026, 5, 31)))
+        self.assertEqual((short.billed_periods, short.next_bill_date), (2, None))
+        self.assertEqual(stopped.billed_periods, 0)
+
+        # 次月再跑只补新到期的一期
+        self.assertEqual(bill_rentals(self.tenant.id, D(2026, 6, 1))['periods'], 1)
+
+    def test_max_chunks_leaves_rest_for_next_call(self):
+        contact = Contact.objects.create(tenant=self.tenant, name='租客')
+        for _ in range(3):
+            RentalContract.objects.create(tenant=self.tenant, contact=contact, product=self.product, start_date=D(2026, 1, 1), duration=12, rent_price=Decimal('10'))
+        with mock.patch('core.services.BILLING_CHUNK', 2):
+            first = bill_rentals(self.tenant.id, D(2026, 1, 1), max_chunks=1)
+            self.assertEqual((first['contracts'], first['more']), (2, True))
+            rest = bill_rentals(self.tenant.id, D(2026, 1, 1), max_chunks=1)
+            self.assertEqual((rest['contracts'], rest['more']), (1, False))
+
+
+# ==========================================
+# 📊 租赁预测
+# ==========================================
+class ProjectMonthsTests(TestCase):
+    def test_numpy_matches_pure_python(self):
+        try: import numpy  # noqa: F401
+        except ImportError: self.skipTest('numpy 未安装')
+        rng = random.Random(7); first = 2026 * 12 + 9
+        rows = [(first + rng.randint(-40, 40), rng.choice((1, 3, 6, 12, 24)), rng.randint(0, 10**6), rng.randint(0, 10**5), rng.randint(0, 10**6)) for _ in range(500)]
+        for months in (1, 12, 36):
+            with self.subTest(months=months):
+                self.assertEqual(project_months(rows, first, months), _project_months_py(rows, first, months))
+        self.assertEqual(project_months([], first, 3), ([0, 0, 0], [0, 0, 0], [0, 0, 0]))
+
+    def test_pure_python_by_hand(self):
+        first = 100
+        # 起租月 99 租 3 个月 (本月、下月在租，第 2 月退押)；起租月 101 租 1 个月 (第 2 月在租，第 3 月退押)；早已到期的押金计入首月
+        rows = [(99, 3, 10, 1, 500), (101, 1, 20, 2, 300), (50, 1, 7, 7, 40)]
+        self.assertEqual(_project_months_py(rows, first, 4), ([10, 30, 0, 0], [1, 3, 0, 0], [40, 0, 800, 0]))
+
+
+# ==========================================
+# 📈 日汇总与看板缓存
+# ==========================================
+class RollupCacheTests(TenantTestCase):
+    def test_dashboard_cache_cleared_after_rollup_bump(self):
+        key = dashboard_cache_key(self.tenant.id); real_bump = analytics.bump_rollup
+        def racing_bump(*args):
+            cache.set(key, 'stale')  # 信号清完缓存、汇总还没累加时进来的看板请求
+            real_bump(*args)
+        with mock.patch('core.analytics.bump_rollup', racing_bump), self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(tenant=self.tenant, product=self.product, type='SALE', amount=Decimal('50'), cost=Decimal('30'))
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(DailyRollup.objects.get(tenant=self.tenant, type='SALE').amount, Decimal('50'))
+
+
+# ==========================================
+# 💹 利润报表
+# ==========================================
+class ProfitDashboardTests(TenantTestCase):
+    def test_stream_and_paged_bodies_match(self):
+        client = APIClient(); client.force_authenticate(self.user)
+        for amount, cost in (('250', '180'), ('99.50', '60')):
+            Transaction.objects.create(tenant=self.tenant, product=self.product, operator=self.user, type='SALE', amount=Decimal(amount), cost=Decimal(cost))
+        paged = json.loads(client.get('/api/analysis/profit_dashboard/').content)
+        streamed = json.loads(b''.join(client.get('/api/analysis/profit_dashboard/?stream=1').streaming_content))
+        paged.pop('next')
+        self.assertEqual(streamed, paged)
+        self.assertIsInstance(streamed['list'][0]['sales'], float)
+
+
+# ==========================================
+# 🔖 扫码转正接口
+# ==========================================
+class StockItemApiTests(TenantTestCase):
+    def setUp(self):
+        self.client = APIClient(); self.client.force_authenticate(self.user)
+
+    def test_confirm_only_accepts_pending(self):
+        sold = StockItem.objects.create(tenant=self.tenant, product=self.product, sn='SOLD-1', status='SOLD')
+        pending = StockItem.objects.create(tenant=self.tenant, product=self.product, sn='WAIT-1', status='PENDING')
+        self.assertEqual(self.client.post('/api/stock-items/confirm/', {'id': sold.id, 'real_sn': 'NEW-1'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/stock-items/confirm/', {'id': pending.id, 'real_sn': 'SOLD-1'}, format='json').status_code, 400)  # SN 已被占用
+        self.assertEqual(self.client.post('/api/stock-items/confirm/', {'id': pending.id, 'real_sn': 'X' * (SN_MAX_LENGTH + 1)}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/stock-items/confirm/', {'id': pending.id, 'real_sn': 'NEW-1'}, format='json').status_code, 200)
+        sold.refresh_from_db(); pending.refresh_from_db()
+        self.assertEqual((sold.sn, sold.status), ('SOLD-1', 'SOLD'))
+        self.assertEqual((pending.sn, pending.status), ('NEW-1', 'IN_STOCK'))
+
+    def test_generic_writes_are_not_routed(self):
+        item = StockItem.objects.create(tenant=self.tenant, product=self.product, sn='SN-1')
+        self.assertEqual(self.client.post('/api/stock-items/', {'sn': 'X'}, format='json').status_code, 405)
+        self.assertEqual(self.client.delete(f'/api/stock-items/{item.id}/').status_code, 405)
+        self.assertEqual(self.client.patch(f'/api/stock-items/{item.id}/', {'note': 'x'}, format='json').status_code, 405)
+        self.assertTrue(StockItem.objects.filter(id=item.id).exists())
+
+
+# ==========================================
+# 🔍 热点查询执行计划
+# ==========================================
+@skipUnless(connection.vendor == 'postgresql', '执行计划检查仅支持 PostgreSQL')
+class QueryPlanTests(TransactionTestCase):
+    """种子数据须提交后 VACUUM (不能在事务里)，所以用 TransactionTestCase，结束时整库清空"""
+    def test_hot_queries_use_their_indexes(self):
+        tenants, product, account = seed_plan_data()
+        vacuum_plan_tables()
+        for name, qs, index in hot_queries(tenants[0], product, account):
+            with self.subTest(name):
+                plan = explain(qs)
+                self.assertIsNone(plan_problem(plan, index), plan)
@@ -1,26 +1,48 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, mixins, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.request import Request
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from asgiref.sync import sync_to_async
 from rest_framework.authentication import SessionAuthentication
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.shortcuts import render, redirect
 from django.db import transaction
-from django.db.models import Sum, Q, F
+from django.db.models import Sum, Q, F, Prefetch
 from decimal import Decimal
 from django.contrib.auth import authenticate, login, logout
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
+from django.core.exceptions import ValidationError
 import json
 from datetime import timedelta
 
 # 引入模型
-from core.models import Product, Contact, RentalContract, Transaction, CapitalAccount, CustomUser, Tenant, StockItem
+from core.models import Product, Contact, RentalContract, Transaction, CapitalAccount, CustomUser, Tenant, StockItem, DailyRollup, SerialNumberFactory
 # 🟢 引入 StockItemSerializer (请确保在 serializers.py 里加了它)
-from core.serializers import ProductSerializer, ContactSerializer, RentalContractSerializer, TransactionSerializer, StaffSerializer, TenantSerializer, CapitalAccountSerializer, StockItemSerializer
+from core.serializers import ProductSerializer, ContactSerializer, RentalContractSerializer, TransactionSerializer, StaffSerializer, TenantSerializer, CapitalAccountSerializer, StockItemSerializer, SerialNumberFactorySerializer, FLOW_HISTORY_LIMIT, flow_queryset, flow_entry
+from core.analytics import dashboard_queries, assemble_dashboard, accounting_queries, assemble_accounting, acached_for_tenant, dashboard_cache_key, rollup_monthly, day_start, profit_rows, profit_row, profit_by_staff, profit_by_customer, opening_balance, statement_rows, statement_row, cached_for_tenant, forecast_cache_key, build_rental_forecast, assemble_forecast, FORECAST_MAX_MONTHS, FORECAST_TTL
+from core.images import ImageFormatError, attach_product_image
+from core.importers import ImportFormatError, iter_file_sns, import_serial_numbers
+from core.pagination import TenantCursorPagination
+from core.parallel import gather_queries
+from core.profiling import span
+from core.search import TrigramSearchFilter
+from core.tenancy import get_cached_tenant, tenant_block_reason
+from core.auth import SignedTokenAuthentication, issue_token
+from core.exporters import EXPORTS, filter_export, export_rows
+from core.streaming import stream_json_list, stream_csv, stream_xlsx
+from core.services import InboundError, MAX_INBOUND_QTY, parse_sn_list, build_inbound_sns, bulk_inbound, StockShortage, claim_fifo_stock, confirm_pending, BalanceError, post_balances, next_zencodes, bill_rentals, BILLING_REQUEST_CHUNKS
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
     def enforce_csrf(self, request): return
 
+# 🟢 网页走会话；扫码枪/APP 带 Authorization: Zen <token> 走签名令牌 (不查会话表)
+API_AUTH = (CsrfExemptSessionAuthentication, SignedTokenAuthentication)
+
 # ==========================================
 # 📄 1. 页面路由
 # ==========================================
@@ -44,14 +66,22 @@ def profile_page(request): return render(request, 'profile.html') if request.use
 # ==========================================
 # 🧱 2. 核心基类
 # ==========================================
-class TenantAwareViewSet(viewsets.ModelViewSet):
-    authentication_classes = (CsrfExemptSessionAuthentication, )
+class TenantReadOnlyViewSet(viewsets.ReadOnlyModelViewSet):
+    authentication_classes = API_AUTH
+    pagination_class = TenantCursorPagination  # 🟢 所有列表接口统一游标分页
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated: return self.queryset.none()
         if user.is_superuser: return self.queryset
-        if not user.tenant: return self.queryset.none()
-        return self.queryset.filter(tenant=user.tenant)
+        if not user.tenant_id: return self.queryset.none()
+        return self.queryset.filter(tenant_id=user.tenant_id)
+    # 🟢 序列化耗时 (扣除 SQL) 计入 Server-Timing 的 ser
+    def list(self, request, *args, **kwargs):
+        with span('ser'): return super().list(request, *args, **kwargs)
+    def retrieve(self, request, *args, **kwargs):
+        with span('ser'): return super().retrieve(request, *args, **kwargs)
+
+class TenantAwareViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin, TenantReadOnlyViewSet):
     def perform_create(self, serializer):
         if self.request.user.tenant: serializer.save(tenant=self.request.user.tenant)
         else: serializer.save()
@@ -66,18 +96,18 @@ class StaffViewSet(TenantAwareViewSet):
     def create(self, request, *args, **kwargs):
         user = request.user
         if user.role != 'ADMIN': return Response({'detail': '无权操作'}, status=403)
-        curr = CustomUser.objects.filter(tenant=user.tenant).count()
-        if curr >= user.tenant.account_limit: return Response({'detail': f'员工数已达上限({user.tenant.account_limit})'}, status=400)
         data = request.data
         if CustomUser.objects.filter(username=data['username']).exists(): return Response({'detail': '账号已存在'}, status=400)
         try:
             pwd = data.get('password') if data.get('password') else '123456'
+            # 员工数上限由 CustomUser.save 统一校验 (只 count 一次)
             CustomUser.objects.create_user(username=data['username'], password=pwd, first_name=data.get('first_name', '员工'), tenant=user.tenant, role='SALES', initials=data.get('first_name', '员工')[-2:])
             return Response({'status': 'ok'})
+        except ValidationError as e: return Response({'detail': e.messages[0]}, status=400)
         except Exception as e: return Response({'detail': str(e)}, status=400)
 
 class MyTenantViewSet(viewsets.ViewSet):
-    authentication_classes = (CsrfExemptSessionAuthentication, )
+    authentication_classes = API_AUTH
     @action(detail=False, methods=['get'])
     def info(self, request): return Response(TenantSerializer(request.user.tenant).data if request.user.tenant else {})
     @action(detail=False, methods=['post'])
@@ -96,14 +126,28 @@ def api_login(request):
         except: data = request.POST
         user = authenticate(username=data.get('username'), password=data.get('password'))
         if user:
-            if user.tenant and not user.tenant.is_active: return JsonResponse({'status': 'error', 'msg': '账户待审核或已停用'})
+            tenant = get_cached_tenant(user.tenant_id); user.tenant = tenant
+            reason = tenant_block_reason(tenant)
+            if reason: return JsonResponse({'status': 'error', 'msg': reason})
             login(request, user)
             role_display = '老板' if user.role == 'ADMIN' else '员工'
-            company = user.tenant.name if user.tenant else '未入驻'
+            company = tenant.name if tenant else '未入驻'
             return JsonResponse({'status': 'ok', 'role': user.role, 'name': user.first_name or user.username, 'tenant': company, 'role_display': role_display})
         return JsonResponse({'status': 'error', 'msg': '账号或密码错误'})
     return JsonResponse({'status': 'error'})
 
+# 🟢 签发 API 令牌 (扫码枪/APP)：账号密码换令牌，之后请求头带 Authorization: Zen <token>
+@csrf_exempt
+def api_token(request):
+    if request.method != 'POST': return JsonResponse({'status': 'error'})
+    try: data = json.loads(request.body)
+    except: data = request.POST
+    user = authenticate(username=data.get('username'), password=data.get('password'))
+    if not user: return JsonResponse({'status': 'error', 'msg': '账号或密码错误'})
+    reason = tenant_block_reason(get_cached_tenant(user.tenant_id))
+    if reason: return JsonResponse({'status': 'error', 'msg': reason})
+    return JsonResponse({'status': 'ok', 'token': issue_token(user), 'expires_in': settings.ZEN_TOKEN_TTL})
+
 def api_logout(request): logout(request); return JsonResponse({'status': 'ok'})
 @csrf_exempt
 def api_change_password(request):
@@ -135,50 +179,64 @@ class CapitalAccountViewSet(TenantAwareViewSet):
         qs = self.get_queryset()
         return Response([{'id': a.id, 'name': a.name, 'balance': a.current_balance} for a in qs])
 
-# 🟢 新增：库存明细管理 (用于待入库转正)
-class StockItemViewSet(TenantAwareViewSet):
+# 🟢 库存明细 (用于待入库转正)：只读，入库走 ProductViewSet.create，改状态只走下面的转正接口
+class StockItemViewSet(TenantReadOnlyViewSet):
     queryset = StockItem.objects.all().order_by('-id')
     serializer_class = StockItemSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [TrigramSearchFilter]
     search_fields = ['sn', 'product__name']
+    search_suffix_fields = ['sn']  # 扫码枪/手输 IMEI 尾号
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().select_related('product')  # product_name 列，避免逐行查商品
         # 支持按状态筛选 (例如只查 PENDING 待入库的)
         status_param = self.request.query_params.get('status')
         if status_param:
             qs = qs.filter(status=status_param)
         return qs
 
-    # 🟢 扫码转正接口 (单个或批量)
+    # 🟢 扫码转正接口 (单个)：与批量转正同一套校验，只接受 PENDING 且真实 SN 未被占用
     @action(detail=False, methods=['post'])
     def confirm(self, request):
-        # 接收 id 和 real_sn
-        item_id = request.data.get('id')
-        real_sn = request.data.get('real_sn')
-        
+        tenant = request.user.tenant
+        if not tenant: return Response({'detail': '无租户信息'}, 400)
+        try:
+            with transaction.atomic():
+                result = confirm_pending(tenant, pairs=[(request.data.get('id'), request.data.get('real_sn'))])[0]
+        except InboundError as e:
+            return Response({'detail': str(e)}, 400)
+        if not result['ok']: return Response({'detail': result['msg']}, 400)
+        return Response({'status': 'ok', 'msg': '入库成功'})
+
+    # 🟢 批量扫码转正：items=[{id 或 sn(WAIT占位), real_sn}]，或 product_id + sns (依次分给最早的待入库)
+    @action(detail=False, methods=['post'])
+    def confirm_batch(self, request):
+        tenant = request.user.tenant
+        if not tenant: return Response({'detail': '无租户信息'}, 400)
+        data = request.data
         try:
-            item = StockItem.objects.get(id=item_id, tenant=request.user.tenant)
-            
-            # 1. 更新为真实SN
-            item.sn = real_sn
-            # 2. 状态改为在库
-            item.status = 'IN_STOCK'
-            item.save()
-            
-            # 3. 这里可以补充财务逻辑
-            # 如果是"确认收货"才付款，可以在这里补 Transaction
-            # 但为了简单，建议入库时已记录(应付)，这里只是核销库存状态
-            
-            return Response({'status': 'ok', 'msg': '入库成功'})
-        except Exception as e:
+            with transaction.atomic():
+                if data.get('product_id'):
+                    product = Product.objects.filter(id=data.get('product_id'), tenant=tenant).first()
+                    if not product: return Response({'detail': '商品不存在'}, 404)
+                    sns = parse_sn_list(data.get('sns'))
+                    if not sns or len(sns) > MAX_INBOUND_QTY: return Response({'detail': f'请扫描 1 ~ {MAX_INBOUND_QTY} 个序列号'}, 400)
+                    results = confirm_pending(tenant, product=product, sns=sns)
+                else:
+                    items = data.get('items') or []
+                    if not isinstance(items, list) or not all(isinstance(x, dict) for x in items): return Response({'detail': 'items 应为 [{id 或 sn, real_sn}] 列表'}, 400)
+                    if not items or len(items) > MAX_INBOUND_QTY: return Response({'detail': f'请提交 1 ~ {MAX_INBOUND_QTY} 条记录'}, 400)
+                    results = confirm_pending(tenant, pairs=[(x.get('id') or x.get('sn'), x.get('real_sn')) for x in items])
+        except InboundError as e:
             return Response({'detail': str(e)}, 400)
+        done = sum(1 for r in results if r['ok'])
+        return Response({'status': 'ok', 'confirmed': done, 'failed': len(results) - done, 'results': results})
 
 
 class ProductViewSet(TenantAwareViewSet):
     queryset = Product.objects.all().order_by('-id') 
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [TrigramSearchFilter]
     search_fields = ['name', 'zencode', 'note']
 
     def get_queryset(self):
@@ -186,9 +244,12 @@ class ProductViewSet(TenantAwareViewSet):
         status_param = self.request.query_params.get('status')
         if status_param and status_param != 'ALL':
             qs = qs.filter(status=status_param)
+        # 🟢 列表页：整页一次性预取每个商品最近 N 条流转 (窗口函数切片)，避免 N+1
+        if self.action == 'list':
+            qs = qs.prefetch_related(Prefetch('transaction_set', queryset=flow_queryset()[:FLOW_HISTORY_LIMIT], to_attr='recent_flow'))
         return qs
 
-    # 🟢 终极批量入库 (分场景处理)
+    # 🟢 终极批量入库 (分场景处理，批量 INSERT)
     def create(self, request, *args, **kwargs):
         user = request.user; tenant = user.tenant
         if not tenant and not user.is_superuser: return Response({'detail': '无租户权限'}, 400)
@@ -198,9 +259,13 @@ class ProductViewSet(TenantAwareViewSet):
         name = data.get('name')
         category = data.get('category', 'ZX')
         base_sn = data.get('sn') 
+        # 🟢 扫码/粘贴的序列号清单 (有清单时数量以清单为准)
+        sn_list = parse_sn_list(data.getlist('sn_list') if hasattr(data, 'getlist') else data.get('sn_list'))
         # 获取数量 (默认为1)
         try: quantity = int(data.get('quantity', 1))
         except: quantity = 1
+        if sn_list: quantity = len(sn_list)
+        if quantity < 1 or quantity > MAX_INBOUND_QTY: return Response({'detail': f'入库数量需在 1 ~ {MAX_INBOUND_QTY} 之间'}, 400)
         
         cost_unit = Decimal(str(data.get('cost_price', 0))) # 单价
         paid_total = Decimal(str(data.get('paid_amount', 0) or 0)) # 总实付
@@ -213,104 +278,104 @@ class ProductViewSet(TenantAwareViewSet):
         if str(need_sn).lower() == 'true': need_sn = True
         else: need_sn = False
 
-        with transaction.atomic():
-            # A. 建立商品档案
-            product, created = Product.objects.get_or_create(
-                name=name, category=category, tenant=tenant,
-                defaults={
-                    'cpu': data.get('cpu', ''), 'gpu': data.get('gpu', ''), 
-                    'ram': data.get('ram', ''), 'disk': data.get('disk', ''), 
-                    'note': data.get('note', ''), 
-                    'cost_price': cost_unit, 'retail_price': data.get('retail_price', 0), 
-                    'zencode': self._gen_code(user, category),
-                    'need_sn': need_sn # 记录该商品属性
-                }
-            )
-            if not created: 
-                product.cost_price = cost_unit
-                product.need_sn = need_sn
-            product.status = 'IN_STOCK'
-            product.save()
-
-            # B. 批量创建库存 (分场景)
-            
-            # 场景1：iPhone (需要SN) -> 状态 PENDING, SN=WAIT-xxx
-            if need_sn:
-                status_code = 'PENDING'
-                sn_prefix = 'WAIT'
-            # 场景2：废品 (不需要SN) -> 状态 IN_STOCK, SN=AUTO-xxx
-            else:
-                status_code = 'IN_STOCK'
-                sn_prefix = 'AUTO' if not base_sn else base_sn
-
-            for i in range(quantity):
-                if need_sn:
-                    # 待录入，生成占位符
-                    final_sn = f"{sn_prefix}-{timezone.now().strftime('%H%M%S%f')}-{i+1}"
-                else:
-                    # 直接入库，自动生成流水号
-                    if base_sn:
-                        final_sn = base_sn if quantity == 1 else f"{base_sn}-{i+1}"
-                    else:
-                        final_sn = f"AUTO-{timezone.now().strftime('%Y%m%d%H%M%S%f')}-{i+1}"
-                
-                StockItem.objects.create(
-                    tenant=tenant, product=product, sn=final_sn, 
-                    real_cost=cost_unit, status=status_code, 
-                    supplier_id=supplier_id if str(supplier_id)!='0' else None, 
+        # 场景1：iPhone (需要SN) 且未扫码 -> 状态 PENDING, SN=WAIT-xxx
+        # 场景2：废品 (不需要SN) 或已扫码 -> 状态 IN_STOCK, SN=AUTO-xxx / 指定SN / 扫码SN
+        status_code = 'PENDING' if need_sn and not sn_list else 'IN_STOCK'
+        # 整批 SN 一次生成 (共用一个时间戳)
+        sns = build_inbound_sns(quantity, need_sn=need_sn, base_sn=base_sn, sn_list=sn_list)
+
+        try:
+            with transaction.atomic():
+                # A. 建立商品档案
+                product, created = Product.objects.get_or_create(
+                    name=name, category=category, tenant=tenant,
+                    defaults={
+                        'cpu': data.get('cpu', ''), 'gpu': data.get('gpu', ''), 
+                        'ram': data.get('ram', ''), 'disk': data.get('disk', ''), 
+                        'note': data.get('note', ''), 
+                        'cost_price': cost_unit, 'retail_price': data.get('retail_price', 0), 
+                        'zencode': lambda: self._gen_code(user, category),  # 仅新建商品时才领号
+                        'need_sn': need_sn # 记录该商品属性
+                    }
+                )
+                if not created: 
+                    product.cost_price = cost_unit
+                    product.need_sn = need_sn
+                product.status = 'IN_STOCK'
+                product.save()
+
+                # A2. 商品图片 (压缩/缩略图/去 EXIF 在提交后由后台线程完成)
+                if request.FILES.get('image'): attach_product_image(product, request.FILES['image'])
+
+                # B. 批量创建库存 (整批查重 + 分批 INSERT，撞号则整单回滚并逐行报告)
+                bulk_inbound(
+                    tenant, product, sns, real_cost=cost_unit, status=status_code,
+                    supplier_id=supplier_id if supplier_id and str(supplier_id) != '0' else None,
                     note=data.get('note', '')
                 )
 
-            # C. 财务流水
-            # 只有当选择了供应商时，才记录
-            if supplier_id and str(supplier_id) != '0':
-                # 🟢 逻辑优化：如果是 PENDING 状态，是否记账？
-                # 魏总指示：要输入50个序列号进去。
-                # 通常：Pending状态不应触发财务扣款，因为货没点清。
-                # 但如果用户在入库时填了“实付金额”，说明已经打款了，必须记账！
-                # 所以：只要有 paid_total，就必须记 Transaction。
-                
-                try:
-                    sup = Contact.objects.get(id=supplier_id)
-                    
-                    # 1. 记录实付流水 (不管货在哪，钱付了就要记)
-                    if acc_id and paid_total > 0:
-                        acc = CapitalAccount.objects.get(id=acc_id)
-                        remark_str = f"采购: {product.name} x {quantity} (含待入库)"
-                        Transaction.objects.create(
-                            tenant=tenant, contact=sup, product=product, account=acc, 
-                            amount=paid_total, type='BUY', operator=user, remark=remark_str
-                        )
-                        acc.current_balance -= paid_total; acc.save()
+                # C. 财务流水
+                # 只有当选择了供应商时，才记录
+                if supplier_id and str(supplier_id) != '0':
+                    # 🟢 逻辑优化：如果是 PENDING 状态，是否记账？
+                    # 魏总指示：要输入50个序列号进去。
+                    # 通常：Pending状态不应触发财务扣款，因为货没点清。
+                    # 但如果用户在入库时填了“实付金额”，说明已经打款了，必须记账！
+                    # 所以：只要有 paid_total，就必须记 Transaction。
                     
-                    # 2. 自动抵扣欠款
-                    # 只有 IN_STOCK 的商品才算应付？
-                    # 不，只要单子开了，就算应付。
-                    total_cost = cost_unit * quantity
-                    debt = total_cost - paid_total
-                    if debt != 0:
-                        sup.balance -= debt; sup.save()
-                except: pass
+                    sup = Contact.objects.filter(id=supplier_id, tenant=tenant).first()
+                    acc = CapitalAccount.objects.filter(id=acc_id, tenant=tenant).first() if acc_id else None
+                    paid = bool(acc_id) and paid_total > 0
+                    if sup and (acc or not paid):  # 填了实付但账户不存在：同原逻辑，不记账
+                        # 1. 记录实付流水 (不管货在哪，钱付了就要记)
+                        if paid:
+                            remark_str = f"采购: {product.name} x {quantity} (含待入库)"
+                            Transaction.objects.create(
+                                tenant=tenant, contact=sup, product=product, account=acc, 
+                                amount=paid_total, type='BUY', operator=user, remark=remark_str
+                            )
+                        
+                        # 2. 自动抵扣欠款
+                        # 只有 IN_STOCK 的商品才算应付？
+                        # 不，只要单子开了，就算应付。
+                        total_cost = cost_unit * quantity
+                        debt = total_cost - paid_total
+                        # 3. 增量过账 (F() 原子累加，固定加锁顺序)
+                        post_balances(tenant.id, accounts={acc.id: -paid_total} if paid else None, contacts={sup.id: -debt})
+
+                return Response(self.get_serializer(product).data, status=status.HTTP_201_CREATED)
+        except InboundError as e:
+            return Response({'detail': str(e), 'conflicts': e.conflicts}, 400)
+        except (ImageFormatError, BalanceError) as e:
+            return Response({'detail': str(e)}, 400)
+
+    # 🟢 编辑商品时换图：同样走图片处理流程
+    def perform_update(self, serializer):
+        product = serializer.save()
+        if self.request.FILES.get('image'): attach_product_image(product, self.request.FILES['image'])
 
-            return Response(self.get_serializer(product).data, status=status.HTTP_201_CREATED)
+    def update(self, request, *args, **kwargs):
+        try:
+            with transaction.atomic(): return super().update(request, *args, **kwargs)
+        except ImageFormatError as e: return Response({'detail': str(e)}, 400)
 
     def _gen_code(self, user, cat):
-        initials = getattr(user, 'initials', 'AD'); dt = timezone.now(); prefix = f"{str(dt.year)[-2:]}{dt.month}{dt.day:02d}{initials}{cat}"
-        count = Product.objects.filter(category=cat, tenant=user.tenant).count() + 1; return f"{prefix}{count}"
+        return next_zencodes(user.tenant, getattr(user, 'initials', 'AD'), cat)[0]  # 🟢 按租户+分类发号，O(1) 且并发不重号
 
-    # 🟢 批量销售逻辑 (自动扣减先进先出)
+    # 🟢 完整流转记录 (按需加载，不占列表页)
+    @action(detail=True, methods=['get'])
+    def flow(self, request, pk=None):
+        product = self.get_object()
+        return Response([flow_entry(t) for t in flow_queryset().filter(product=product)])
+
+    # 🟢 批量销售逻辑 (自动扣减先进先出，SKIP LOCKED 并发安全)
     @action(detail=True, methods=['post'])
     def sell(self, request, pk=None):
         product = self.get_object(); user = request.user
         
         try: quantity = int(request.data.get('quantity', 1))
         except: quantity = 1
-        
-        # 自动找出最早入库的 N 个 (且必须是 IN_STOCK)
-        stocks = StockItem.objects.filter(product=product, status='IN_STOCK', tenant=user.tenant).order_by('id')[:quantity]
-        
-        if stocks.count() < quantity:
-            return Response({'detail': f'库存不足！当前仅剩 {stocks.count()} 台，无法卖出 {quantity} 台'}, 400)
+        if quantity < 1: return Response({'detail': '销售数量必须大于 0'}, 400)
         
         unit_price = Decimal(str(request.data.get('price')))
         received_total = Decimal(str(request.data.get('received_amount', 0) or 0))
@@ -318,31 +383,26 @@ class ProductViewSet(TenantAwareViewSet):
         
         try:
             with transaction.atomic():
-                # A. 批量扣减
-                for s in stocks:
-                    s.status = 'SOLD'
-                    s.save()
+                # A. 认领最早入库的 N 台并批量扣减 (一条 UPDATE，库存不足则整单回滚)
+                sns, cost = claim_fifo_stock(product, quantity, with_cost=True)
                 
                 # B. 记账
-                contact = Contact.objects.get(id=contact_id)
-                acc = CapitalAccount.objects.get(id=acc_id) if acc_id else None
+                contact = Contact.objects.get(id=contact_id, tenant_id=product.tenant_id)
+                acc = CapitalAccount.objects.get(id=acc_id, tenant_id=product.tenant_id) if acc_id else None
                 remark_str = f"销售: {product.name} x {quantity}"
                 
                 Transaction.objects.create(
                     tenant=user.tenant, contact=contact, product=product, account=acc, 
-                    amount=received_total, type='SALE', operator=user, remark=remark_str
+                    amount=received_total, cost=cost, type='SALE', operator=user, remark=remark_str
                 )
                 
-                if acc and received_total > 0: 
-                    acc.current_balance += received_total; acc.save()
-                
-                # C. 抵扣
+                # C. 抵扣 + 增量过账 (F() 原子累加，多个收银台同时收款不丢更新)
                 total_sell_price = unit_price * quantity
                 debt = total_sell_price - received_total
-                contact.balance += debt
-                contact.save()
+                post_balances(product.tenant_id, accounts={acc.id: received_total} if acc and received_total > 0 else None, contacts={contact.id: debt})
                 
-                return Response({'msg': 'OK'})
+                return Response({'msg': 'OK', 'sns': sns})
+        except (StockShortage, BalanceError) as e: return Response({'detail': str(e)}, 400)
         except Exception as e: return Response({'detail': str(e)}, 500)
 
 class ContactViewSet(TenantAwareViewSet):
@@ -365,123 +425,215 @@ class ContactViewSet(TenantAwareViewSet):
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None): return Response([])
 
+# 🟢 序列号工厂 (IMEI 清单导入)
+class SerialNumberFactoryViewSet(TenantAwareViewSet):
+    queryset = SerialNumberFactory.objects.all().order_by('-id')
+    serializer_class = SerialNumberFactorySerializer
+    filter_backends = [TrigramSearchFilter]
+    search_fields = ['sn']
+    search_suffix_fields = ['sn']
+
+    # 上传 CSV/TXT/XLSX (multipart 字段 file)，流式解析分批入库
+    @action(detail=False, methods=['post'])
+    def import_file(self, request):
+        tenant = request.user.tenant
+        if not tenant: return Response({'detail': '无租户信息'}, 400)
+        f = request.FILES.get('file')
+        if not f: return Response({'detail': '请上传文件'}, 400)
+        try: stats = import_serial_numbers(tenant, iter_file_sns(f, f.name), src_type=request.data.get('src_type') or 'import')
+        except ImportFormatError as e: return Response({'detail': str(e)}, 400)
+        return Response({'status': 'ok', **stats})
+
 class RentalViewSet(TenantAwareViewSet):
-    queryset = RentalContract.objects.all().order_by('-id'); serializer_class = RentalContractSerializer
+    queryset = RentalContract.objects.select_related('contact', 'product', 'operator').order_by('-id'); serializer_class = RentalContractSerializer  # 列表带客户/设备/经手人名，一次 JOIN
+
+    # 🟢 租赁台常用查询：落库的到期日/归还日上做索引范围查询，按日期升序，最多 ZEN_MAX_PAGE_SIZE 条
+    def _by_date(self, qs, field):
+        return Response(self.get_serializer(qs.order_by(field, 'id')[:settings.ZEN_MAX_PAGE_SIZE], many=True).data)
+
+    # 即将到期 (?days=7，含今天)
+    @action(detail=False)
+    def expiring(self, request):
+        try: days = min(max(int(request.query_params.get('days', 7)), 0), 366)
+        except ValueError: days = 7
+        today = timezone.localdate()
+        return self._by_date(self.get_queryset().filter(is_active=True, due_date__gte=today, due_date__lte=today + timedelta(days=days)), 'due_date')
+
+    # 已逾期：过了到期日仍在租
+    @action(detail=False)
+    def overdue(self, request):
+        return self._by_date(self.get_queryset().filter(is_active=True, due_date__lt=timezone.localdate()), 'due_date')
+
+    # 今日归还
+    @action(detail=False)
+    def returned_today(self, request):
+        return self._by_date(self.get_queryset().filter(end_date=timezone.localdate()), 'end_date')
+
+    # 🟢 月结出账：本租户进行中的合同补齐到 date (默认今天) 应出未出的账期，可重复点；dry_run=1 只试算
+    # 单次最多处理 BILLING_REQUEST_CHUNKS 批，返回 more=True 时再调一次 (幂等，已出账的不会重复)
+    @action(detail=False, methods=['post'])
+    def bill(self, request):
+        user = request.user
+        if user.role == 'SALES': return Response({'detail': '无权操作'}, status=403)
+        if not user.tenant_id: return Response({'detail': '无租户信息'}, 400)
+        raw = str(request.data.get('date') or '')
+        try: as_of = parse_date(raw) if raw else timezone.localdate()
+        except ValueError: as_of = None  # 格式对但日期不存在，如 2026-02-30
+        if not as_of: return Response({'detail': '日期格式应为 YYYY-MM-DD'}, 400)
+        if as_of > timezone.localdate(): return Response({'detail': '不能提前出账'}, 400)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+        return Response(bill_rentals(user.tenant_id, as_of, dry_run=dry_run, max_chunks=BILLING_REQUEST_CHUNKS))
+
+# 🟢 数据导出：/api/export/{stock,transactions,contacts}/?fmt=csv|xlsx，边查边写
+class ExportViewSet(viewsets.ViewSet):
+    authentication_classes = API_AUTH
+
+    def _export(self, request, kind, model):
+        user = request.user
+        if user.is_superuser: qs = model.objects.all()
+        elif user.tenant: qs = model.objects.filter(tenant=user.tenant)
+        else: return Response({'detail': '无租户信息'}, 400)
+        header = EXPORTS[kind][0]
+        rows = export_rows(kind, filter_export(kind, qs, request.query_params))
+        filename = f"{kind}_{timezone.localdate():%Y%m%d}"
+        if request.query_params.get('fmt') == 'xlsx':
+            try: return stream_xlsx(header, rows, filename + '.xlsx')
+            except ImportError: return Response({'detail': '服务器未安装 openpyxl，请改用 CSV 导出'}, 400)
+        return stream_csv(header, rows, filename + '.csv')
+
+    @action(detail=False)
+    def stock(self, request): return self._export(request, 'stock', StockItem)
+    @action(detail=False)
+    def transactions(self, request):
+        if request.user.role == 'SALES': return Response({'detail': '无权访问'}, status=403)
+        return self._export(request, 'transactions', Transaction)
+    @action(detail=False)
+    def contacts(self, request): return self._export(request, 'contacts', Contact)
 
 # ==========================================
 # 🟢 全能分析接口
 # ==========================================
+def tenant_qs(user, model):
+    """按当前用户隔离：超管看全部，租户用户看本租户"""
+    if user.is_superuser: return model.objects.all()
+    if user.tenant_id: return model.objects.filter(tenant_id=user.tenant_id)
+    return model.objects.none()
+
+async def _api_user(request):
+    """异步视图复用 API 认证 (会话 / 签名令牌)，未登录或认证失败返回 None"""
+    def auth():
+        try: return Request(request, authenticators=[a() for a in API_AUTH]).user
+        except APIException: return None
+    user = await sync_to_async(auth)()
+    return user if user is not None and user.is_authenticated else None
+
+def _json(data): return HttpResponse(JSONRenderer().render(data), content_type='application/json')  # 与 DRF 接口同一渲染器 (紧凑分隔符/中文不转义/Decimal 同样转换)
+
+# 🟢 首页看板 (异步)：6 条聚合并发执行，耗时≈最慢的一条；按租户缓存 (流水/库存/客户/账户变更时自动失效)
+async def analysis_dashboard(request):
+    user = await _api_user(request)
+    if not user: return JsonResponse({'detail': '请先登录'}, status=403)
+    tenant_id = None if user.is_superuser else user.tenant_id
+    if not user.is_superuser and not tenant_id: return _json({})
+    qs = [tenant_qs(user, m) for m in (Transaction, StockItem, Contact, CapitalAccount, DailyRollup)]
+    async def build(): return assemble_dashboard(await gather_queries(dashboard_queries(*qs)))
+    return _json(await acached_for_tenant(dashboard_cache_key(tenant_id), build))
+
+# 🟢 资产总览 (异步)：账户 / 库存货值 / 应收应付 并发查询
+async def analysis_accounting(request):
+    user = await _api_user(request)
+    if not user: return JsonResponse({'detail': '请先登录'}, status=403)
+    qs = [tenant_qs(user, m) for m in (CapitalAccount, StockItem, Contact)]
+    return _json(assemble_accounting(await gather_queries(accounting_queries(*qs))))
+
 class AnalysisViewSet(viewsets.ViewSet):
-    authentication_classes = (CsrfExemptSessionAuthentication, )
+    authentication_classes = API_AUTH
+    # 看板 dashboard / 资产 accounting 为异步视图 (analysis_dashboard / analysis_accounting)，路由在 urls.py
     
-    def _get_qs(self, model):
-        user = self.request.user
-        if user.is_superuser: return model.objects.all()
-        if user.tenant: return model.objects.filter(tenant=user.tenant)
-        return model.objects.none()
+    def _get_qs(self, model): return tenant_qs(self.request.user, model)
     
     @action(detail=False)
-    def dashboard(self, request):
-        today = timezone.localtime(timezone.now()).date()
-        products = self._get_qs(Product)
-        txs = self._get_qs(Transaction)
-        contacts = self._get_qs(Contact)
-        accounts = self._get_qs(CapitalAccount)
-        items = self._get_qs(StockItem) 
-
-        # 🟢 修复：库存货值只算 IN_STOCK (不含 PENDING)
-        stock_val = items.filter(status='IN_STOCK').aggregate(Sum('real_cost'))['real_cost__sum'] or 0
+    def profit_dashboard(self, request):
+        if request.user.role == 'SALES': return Response({'detail': '无权访问'}, status=403)
+        start = parse_date(request.query_params.get('start_date') or ''); end = parse_date(request.query_params.get('end_date') or ''); staff_id = request.query_params.get('staff_id')
+        txs = self._get_qs(Transaction).filter(type='SALE')
+        rollups = self._get_qs(DailyRollup).filter(type='SALE')
+        # 🟢 半开时间区间过滤 (不对 created_at 做 __date 转换，可走索引)
+        if start: txs = txs.filter(created_at__gte=day_start(start)); rollups = rollups.filter(day__gte=start)
+        if end: txs = txs.filter(created_at__lt=day_start(end + timedelta(days=1))); rollups = rollups.filter(day__lte=end)
+        if staff_id: txs = txs.filter(operator_id=staff_id); rollups = rollups.filter(staff_id=staff_id)
         
-        today_entry = items.filter(in_time__date=today).count()
-        today_sale_count = txs.filter(type='SALE', created_at__date=today).count()
+        # A. 汇总：直接读经营日汇总表
+        summary = rollups.aggregate(sales=Sum('amount'), cost=Sum('cost'))
+        total_sales = summary['sales'] or 0; total_cost = summary['cost'] or 0
+        head = {'summary': {'sales': total_sales, 'cost': total_cost, 'profit': total_sales - total_cost}}
 
-        def calc_sales(qs):
-            total = 0
-            for t in qs:
-                total += t.amount
-            return total
+        # B. 员工 / 客户排行：分组聚合
+        head['breakdown'] = {'staff': profit_by_staff(rollups), 'customer': profit_by_customer(txs)}
+        staff_list = CustomUser.objects.filter(tenant=request.user.tenant, role='SALES').values('id', 'first_name', 'username')
+        head['options'] = {'staff': [{'id': u['id'], 'name': u['first_name'] or u['username']} for u in staff_list]}
 
-        today_txs = txs.filter(Q(type='SALE')|Q(type='RENT'), created_at__date=today).select_related('product')
-        today_sale_amount = calc_sales(today_txs)
-        
-        receivable = contacts.filter(balance__gt=0).aggregate(Sum('balance'))['balance__sum'] or 0
-        payable = contacts.filter(balance__lt=0).aggregate(Sum('balance'))['balance__sum'] or 0
-        total_cash = accounts.aggregate(Sum('current_balance'))['current_balance__sum'] or 0
-
-        days = []; sales_data = []
-        for i in range(6, -1, -1):
-            day = today - timedelta(days=i)
-            day_qs = txs.filter(Q(type='SALE')|Q(type='RENT'), created_at__date=day).select_related('product')
-            days.append(day.strftime('%m-%d')); sales_data.append(float(calc_sales(day_qs)))
-
-        recent_txs = txs.select_related('product').order_by('-created_at')[:10]
-        recent_list = []
-        for t in recent_txs:
-            recent_list.append({
-                'id': t.id, 
-                'desc': f"{t.get_type_display()} - {t.product.name if t.product else (t.remark or '-')}", 
-                'amount': t.amount, 
-                'is_income': t.type in ['SALE', 'RENT', 'OTHER'], 
-                'time': t.created_at.strftime('%m-%d %H:%M')
-            })
-            
-        return Response({
-            'cards': {'stock_val': stock_val, 'total_sales_amount': today_sale_amount, 'receivable': receivable, 'payable': abs(payable), 'cash': total_cash}, 
-            'today_entry': today_entry, 'today_sale': today_sale_count,
-            'charts': {'trend': {'labels': days, 'data': sales_data}, 'category': {'labels': ['默认'], 'data': [1]}}, 
-            'recent_list': recent_list
-        })
+        # C. 明细：只取需要的列，数据库算毛利；?stream=1 流式输出全部，否则游标分页
+        rows = profit_rows(txs)
+        if request.query_params.get('stream') in ('1', 'true'):
+            return stream_json_list((profit_row(r) for r in rows.order_by('-id').iterator(chunk_size=2000)), head)
+        paginator = TenantCursorPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return Response({**head, 'list': [profit_row(r) for r in page], 'next': paginator.get_next_link()})
 
+    # 🟢 月度环比 (近 N 个月各类型金额 + 销售毛利，读日汇总表)
     @action(detail=False)
-    def accounting(self, request):
-        accounts = self._get_qs(CapitalAccount); items = self._get_qs(StockItem); contacts = self._get_qs(Contact)
-        total_cash = sum([a.current_balance for a in accounts]) or 0
-        stock_value = items.filter(status='IN_STOCK').aggregate(Sum('real_cost'))['real_cost__sum'] or 0
-        receivable = contacts.filter(balance__gt=0).aggregate(Sum('balance'))['balance__sum'] or 0
-        payable = contacts.filter(balance__lt=0).aggregate(Sum('balance'))['balance__sum'] or 0
-        net_worth = total_cash + stock_value + receivable + payable 
-        return Response({'cash': total_cash, 'stock': stock_value, 'receivable': receivable, 'payable': abs(payable), 'net_worth': net_worth, 'accounts': [{'id': a.id, 'name': a.name, 'balance': a.current_balance} for a in accounts]})
-    
+    def monthly(self, request):
+        if request.user.role == 'SALES': return Response({'detail': '无权访问'}, status=403)
+        try: months = min(max(int(request.query_params.get('months', 12)), 1), 36)
+        except ValueError: months = 12
+        return Response(rollup_monthly(self._get_qs(DailyRollup), months))
+
+    # 🟢 租赁预测：未来 N 个月 (?months=12，最多 36) 租金 / 折旧 / 毛利 / 退押金 / 净现金流，按租户缓存 (合同变更时失效)
     @action(detail=False)
-    def profit_dashboard(self, request):
+    def rental_forecast(self, request):
         if request.user.role == 'SALES': return Response({'detail': '无权访问'}, status=403)
-        start = request.query_params.get('start_date'); end = request.query_params.get('end_date'); staff_id = request.query_params.get('staff_id')
-        txs = self._get_qs(Transaction).filter(type='SALE')
-        if start: txs = txs.filter(created_at__date__gte=start)
-        if end: txs = txs.filter(created_at__date__lte=end)
-        if staff_id: txs = txs.filter(operator_id=staff_id)
-        
-        total_sales = 0; total_cost = 0; list_data = []
-        for t in txs.select_related('product', 'operator', 'contact').order_by('-created_at'):
-            sale_amt = t.amount
-            cost_amt = t.product.cost_price if t.product else 0
-            profit = sale_amt - cost_amt
-            total_sales += sale_amt; total_cost += cost_amt
-            list_data.append({
-                'date': t.created_at.strftime('%Y-%m-%d'),
-                'product_name': t.product.name if t.product else '未知商品',
-                'zencode': t.product.zencode if t.product else '-',
-                'staff': t.operator.first_name if t.operator else '系统',
-                'customer': t.contact.name if t.contact else '散客',
-                'profit': profit,
-                'sales': sale_amt 
-            })
-        
-        staff_list = CustomUser.objects.filter(tenant=request.user.tenant, role='SALES').values('id', 'first_name', 'username')
-        staff_opts = [{'id': u['id'], 'name': u['first_name'] or u['username']} for u in staff_list]
-        return Response({'summary': {'sales': total_sales, 'cost': total_cost, 'profit': total_sales - total_cost}, 'list': list_data, 'options': {'staff': staff_opts}})
+        try: months = min(max(int(request.query_params.get('months', 12)), 1), FORECAST_MAX_MONTHS)
+        except ValueError: months = 12
+        tenant_id = None if request.user.is_superuser else request.user.tenant_id
+        raw = cached_for_tenant(forecast_cache_key(tenant_id), lambda: build_rental_forecast(self._get_qs(RentalContract)), FORECAST_TTL)
+        return Response(assemble_forecast(raw, months))
 
+    # 🟢 账户对账单：按 id 倒序游标分页 (?before=上页最后一条id)，带累计余额；?export=csv 流式导出整个区间
     @action(detail=False)
     def account_history(self, request):
         acc_id = request.query_params.get('id'); 
         if not acc_id: return Response([])
-        txs = self._get_qs(Transaction).filter(account_id=acc_id).select_related('contact', 'product', 'operator').order_by('-created_at')
-        data = []
-        for t in txs:
-            is_income = t.type in ['SALE', 'RENT', 'OTHER']; 
-            if t.type == 'BUY': is_income = False
-            target = '-'
-            if t.contact: target = t.contact.name
-            elif t.product: target = t.product.name
-            data.append({'id': t.id, 'date': t.created_at.strftime('%Y-%m-%d %H:%M'), 'type_name': t.get_type_display(), 'amount': t.amount, 'sign': '+' if is_income else '-', 'is_income': is_income, 'target': target, 'remark': t.remark or '-', 'operator': t.operator.first_name if t.operator else '系统'})
-        return Response(data)
\ No newline at end of file
+        acc = self._get_qs(CapitalAccount).filter(id=acc_id).first()
+        if not acc: return Response({'detail': '账户不存在'}, status=404)
+        start = parse_date(request.query_params.get('start_date') or ''); end = parse_date(request.query_params.get('end_date') or '')
+        
+        txs = self._get_qs(Transaction).filter(account=acc)
+        opening = opening_balance(acc, txs, start)
+        if start: txs = txs.filter(created_at__gte=day_start(start))
+        if end: txs = txs.filter(created_at__lt=day_start(end + timedelta(days=1)))
+        rows = statement_rows(txs)
+
+        if request.query_params.get('export') == 'csv':
+            lines = (statement_row(r, opening) for r in rows.order_by('id').iterator(chunk_size=2000))
+            return stream_csv(['时间', '类型', '收支', '金额', '余额', '对象', '摘要', '经手人'],
+                              ([d['date'], d['type_name'], d['sign'], d['amount'], d['balance'], d['target'], d['remark'], d['operator']] for d in lines),
+                              f"account_{acc.id}.csv")
+
+        try: page_size = min(int(request.query_params.get('page_size', settings.ZEN_PAGE_SIZE)), settings.ZEN_MAX_PAGE_SIZE)
+        except ValueError: page_size = settings.ZEN_PAGE_SIZE
+        try: before = int(request.query_params.get('before') or 0)
+        except ValueError: return Response({'detail': 'before 参数应为流水ID'}, status=400)
+        if before: rows = rows.filter(id__lt=before)
+        page = list(rows.order_by('-id')[:page_size + 1])
+        has_more = len(page) > page_size; page = page[:page_size]
+        data = [statement_row(r, opening) for r in page]
+        return Response({
+            'account': {'id': acc.id, 'name': acc.name, 'balance': acc.current_balance},
+            'opening': opening,
+            # 本页期初 = 本页最早一笔之前的余额；本页期末 = 最新一笔之后的余额
+            'page_opening': data[-1]['balance'] - page[-1]['signed'] if data else opening,
+            'page_closing': data[0]['balance'] if data else opening,
+            'list': data,
+            'next_before': page[-1]['id'] if has_more else None
+        })
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+生产环境由 gunicorn + uvicorn worker 加载 (见 gunicorn.conf.py)：
+分析类异步接口在事件循环里并发等待数据库，其余同步接口由 Django 自动放进线程执行。
 """
 
 import os
@@ -13,4 +16,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'corezen_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 后台 (admin / simpleui) 的静态文件：不再经 runserver，由 ASGI 层直接返回
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler  # noqa: E402
+application = ASGIStaticFilesHandler(django_application)
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 # 🟢 新增：允许 CSRF 校验的域名白名单
 CSRF_TRUSTED_ORIGINS = ['https://erp.corezen.site']
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -15,6 +16,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # pg_trgm 模糊搜索
     # --- 第三方库 ---
     'rest_framework',
     'corsheaders',
@@ -29,6 +31,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.tenancy.TenantMiddleware', # 租户上下文 (缓存租户 + 停用/到期拦截)
+    'core.profiling.QueryProfileMiddleware', # SQL 剖析 (Server-Timing / 慢请求日志 / N+1)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,12 +78,54 @@ USE_TZ = True
 STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# --- 🟢 列表分页 (游标分页，见 core/pagination.py) ---
+ZEN_PAGE_SIZE = 50        # 默认每页条数，前端可用 ?page_size= 覆盖
+ZEN_MAX_PAGE_SIZE = 1000  # 单页上限
+
+# --- 🟢 缓存 (首页看板等)：配置 REDIS_URL 时多进程共享、失效全局生效；否则用进程内缓存 ---
+if os.environ.get('REDIS_URL'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL']}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'zen'}}
+
+# --- 🟢 会话与认证 (core/auth.py)：ZEN_SESSION_MODE = db | cached_db | cache ---
+# cached_db：会话先读缓存，未命中才查库；cache：只存缓存。两者都要求 REDIS_URL：
+# 进程内缓存只在本 worker 失效，登出/改密码/停用后其他 worker 仍认旧会话。未配 REDIS_URL 时默认 db 并拒绝另外两种
+ZEN_SESSION_MODE = os.environ.get('ZEN_SESSION_MODE', 'cached_db' if os.environ.get('REDIS_URL') else 'db')
+if ZEN_SESSION_MODE != 'db' and not os.environ.get('REDIS_URL'):
+    raise ImproperlyConfigured(f'ZEN_SESSION_MODE={ZEN_SESSION_MODE} 需要配置 REDIS_URL (多进程共享缓存)')
+SESSION_ENGINE = {'db': 'django.contrib.sessions.backends.db', 'cached_db': 'django.contrib.sessions.backends.cached_db',
+                  'cache': 'django.contrib.sessions.backends.cache'}[ZEN_SESSION_MODE]
+# 登录用户对象按 id 缓存 (保存/删除用户时失效)，同理只在有 REDIS_URL 时启用 (0 = 每次查库)；保留 ModelBackend 以兼容升级前的已登录会话
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend']
+ZEN_USER_CACHE_TTL = 300 if os.environ.get('REDIS_URL') else 0
+# 扫码枪/APP 用的签名令牌 (Authorization: Zen <token>)，不占会话存储
+ZEN_TOKEN_TTL = 7 * 24 * 3600
+
+# --- 🟢 并发查询线程池 (core/parallel.py)：看板等独立聚合并发执行，每线程一条持久连接 ---
+# 池线程的连接按 ZEN_QUERY_CONN_MAX_AGE 秒复用 (带健康检查，出错/超龄才重连)；请求线程仍是默认 CONN_MAX_AGE=0 (ASGI 下不能全局开持久连接)
+ZEN_QUERY_WORKERS = int(os.environ.get('ZEN_QUERY_WORKERS', 8))
+ZEN_QUERY_CONN_MAX_AGE = int(os.environ.get('ZEN_QUERY_CONN_MAX_AGE', 300))
+
+# --- 🟢 请求剖析 (core/profiling.py)：常开，Server-Timing 只发给工作人员；?_profile=1 (工作人员) 或 profile_tenant 命令开启详细模式 (N+1 检测) ---
+ZEN_PROFILE = os.environ.get('ZEN_PROFILE', '1') == '1'
+ZEN_SLOW_REQUEST_MS = int(os.environ.get('ZEN_SLOW_REQUEST_MS', 500))  # 超过即写慢请求日志
+ZEN_NPLUSONE_THRESHOLD = 5  # 同一形状 SQL 单请求内执行次数达到即标记
+LOGGING = {
+    'version': 1, 'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'zen': {'handlers': ['console'], 'level': 'INFO'}, 'core': {'handlers': ['console'], 'level': 'INFO'}},
+}
+
 # --- 自定义用户模型 ---
 AUTH_USER_MODEL = 'core.CustomUser'
 
 # --- 图片存储路径 (映射到腾讯云硬盘) ---
 MEDIA_URL = '/uploads/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'uploads')
+# 🟢 商品图片处理 (core/images.py)：原图先暂存到这里，后台线程压缩/出缩略图后删除
+ZEN_IMAGE_SPOOL = os.path.join(BASE_DIR, 'uploads_spool')
+ZEN_IMAGE_WORKERS = 2
 # --- SimpleUI 个性化配置 (加在文件最后) ---
 SIMPLEUI_HOME_INFO = False  # 关闭首页广告
 SIMPLEUI_ANALYSIS = False   # 关闭分析
@@ -11,7 +11,10 @@ router = DefaultRouter()
 router.register(r'products', views.ProductViewSet)
 router.register(r'contacts', views.ContactViewSet)
 router.register(r'rentals', views.RentalViewSet)
+router.register(r'stock-items', views.StockItemViewSet)
+router.register(r'sn-factory', views.SerialNumberFactoryViewSet)
 router.register(r'analysis', views.AnalysisViewSet, basename='analysis')
+router.register(r'export', views.ExportViewSet, basename='export')
 # 🟢 新增管理接口
 router.register(r'staff', views.StaffViewSet, basename='staff')
 router.register(r'my-tenant', views.MyTenantViewSet, basename='my-tenant')
@@ -39,7 +42,11 @@ urlpatterns = [
     
     path('api/login/', views.api_login),
     path('api/logout/', views.api_logout),
+    path('api/token/', views.api_token),
     path('api/change_password/', views.api_change_password),
     path('api/register/', views.api_register),
+    # 🟢 异步分析接口 (并发聚合)，需排在 router 之前
+    path('api/analysis/dashboard/', views.analysis_dashboard),
+    path('api/analysis/accounting/', views.analysis_accounting),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
@@ -0,0 +1,28 @@
+# ==========================================
+# 🚀 生产 ASGI 服务：gunicorn 管进程，uvicorn worker 跑事件循环
+# 启动：gunicorn -c gunicorn.conf.py corezen_backend.asgi:application
+# ==========================================
+import os
+import sys
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+worker_class = 'uvicorn.workers.UvicornWorker'
+# 每个进程的数据库连接 ≈ 1 (请求线程) + ZEN_QUERY_WORKERS (并发查询池)，进程数 x 连接数不要超过 PostgreSQL max_connections
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+timeout = 120            # 大报表导出留足时间
+graceful_timeout = 30
+keepalive = 5
+max_requests = 2000      # 定期轮换进程，防内存缓慢增长
+max_requests_jitter = 200
+accesslog = '-'
+errorlog = '-'
+
+def on_starting(server):
+    # 缓存失效 (看板/租户/登录用户/性能开关/租赁预测) 靠共享缓存传到各进程；进程内缓存只在本 worker 生效
+    if workers > 1 and not os.environ.get('REDIS_URL'):
+        server.log.warning('workers=%s 但未配置 REDIS_URL：各进程缓存互不相通，失效只对单个 worker 生效', workers)
+
+def worker_exit(server, worker):
+    # 进程轮换 (max_requests) / 重启前把进程内的图片处理队列跑完；超过 graceful_timeout 被强杀的，暂存文件留给 process_images 命令
+    images = sys.modules.get('core.images')
+    if images: images.drain_image_queue()